@@ -0,0 +1,39 @@
+"""
+Версии (поколения) закэшированных ответов по моделям.
+
+Поколение модели — время ее последнего изменения в миллисекундах.
+Оно входит в ключи кэша ответов, поэтому изменение модели делает
+все зависящие от нее записи недоступными без перебора ключей.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_generation_key(model):
+    return f'cache_generation:{model._meta.label_lower}'
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def get_generations(models):
+    """Возвращает {model: поколение} одним запросом к кэшу."""
+    keys = {get_generation_key(model): model for model in models}
+    generations = cache.get_many(keys)
+    for key in keys.keys() - generations.keys():
+        cache.add(key, _now(), timeout=None)
+        generations[key] = cache.get(key)
+    return {model: generations[key] for key, model in keys.items()}
+
+
+def bump_generation(model):
+    """Сбрасывает кэш ответов, зависящих от модели."""
+    key = get_generation_key(model)
+    cache.set(key, max(_now(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def bump_generation_on_commit(model):
+    transaction.on_commit(lambda: bump_generation(model))
@@ -1 +1,12 @@
 MIN_AMOUNT_AND_COOKING_TIME = 1
+PAGINATION_COUNT_CACHE_TTL = 60
+BATCH_MAX_SIZE = 100
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+THUMBNAIL_QUALITY = 80
+UPLOAD_TTL = 60 * 60 * 24
+MEDIA_GC_GRACE = 60 * 60
+FEED_CACHE_SIZE = 500
+FEED_CACHE_MIN_FOLLOWING = 50
+FEED_CACHE_TTL = 60 * 60 * 24
+FEED_PUSH_BATCH_SIZE = 1000
@@ -1,8 +1,69 @@
 from functools import wraps
 
-from django.core.cache import cache
-from rest_framework import status
-from rest_framework.response import Response
+from django_redis import get_redis_connection
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+RATE_LIMIT_MESSAGE = 'Слишком много запросов. Попробуйте позже.'
+
+# Счетчик увеличивается и получает срок жизни в одной атомарной
+# операции: время окна отсчитывается от первого запроса и не
+# продлевается последующими.
+RATE_LIMIT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    ttl = tonumber(ARGV[1])
+end
+return {count, ttl}
+"""
+
+
+class RateLimiter:
+    """
+    Ограничитель запросов с фиксированным окном на Redis.
+
+    Каждая проверка — один вызов Lua-скрипта (EVALSHA). Ключ строится
+    по id пользователя, а для анонимных запросов — по IP клиента
+    из X-Forwarded-For с учетом REST_FRAMEWORK['NUM_PROXIES'].
+
+    Args:
+        requests (int): Максимальное количество запросов
+        interval (int): Интервал времени в секундах
+        key_prefix (str): Префикс для ключа кэша
+    """
+
+    def __init__(self, requests=60, interval=60, key_prefix='default'):
+        self.requests = requests
+        self.interval = interval
+        self.key_prefix = key_prefix
+        self._script = None
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._script = get_redis_connection('default').register_script(
+                RATE_LIMIT_SCRIPT
+            )
+        return self._script
+
+    def get_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{BaseThrottle().get_ident(request)}'
+        return f'rate_limit:{self.key_prefix}:{ident}'
+
+    def check(self, request):
+        """Учитывает запрос и выбрасывает Throttled при превышении."""
+        count, ttl = self.script(
+            keys=[self.get_key(request)],
+            args=[self.interval]
+        )
+        if count > self.requests:
+            raise Throttled(wait=ttl, detail=RATE_LIMIT_MESSAGE)
 
 
 def rate_limit(requests=60, interval=60, key_prefix='default'):
@@ -14,24 +75,12 @@ def rate_limit(requests=60, interval=60, key_prefix='default'):
         interval (int): Интервал времени в секундах
         key_prefix (str): Префикс для ключа кэша
     """
+    limiter = RateLimiter(requests, interval, key_prefix)
+
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(view_instance, request, *args, **kwargs):
-            # Формируем ключ для кэша
-            key = f"rate_limit:{key_prefix}:{request.META.get('REMOTE_ADDR')}"
-
-            # Получаем текущее количество запросов
-            requests_count = cache.get(key, 0)
-
-            if requests_count >= requests:
-                return Response(
-                    {"detail": "Слишком много запросов. Попробуйте позже."},
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-
-            # Увеличиваем счетчик запросов
-            cache.set(key, requests_count + 1, interval)
-
+            limiter.check(request)
             return view_func(view_instance, request, *args, **kwargs)
         return _wrapped_view
     return decorator
@@ -41,6 +90,13 @@ def method_rate_limit(requests=None, interval=None):
     """
     Декоратор для ограничения запросов к конкретным методам API.
 
+    Ограничители создаются один раз для класса представления.
+    Проверка выполняется в начале initial(), до проверки прав и
+    троттлинга DRF. Перед ней явно вызывается perform_authentication(),
+    чтобы лимит считался по пользователю, а не по общему IP;
+    повторная аутентификация в initial() берет уже найденного
+    пользователя.
+
     Args:
         requests (dict): Словарь с лимитами для каждого метода
         interval (dict): Словарь с интервалами для каждого метода
@@ -64,21 +120,24 @@ def method_rate_limit(requests=None, interval=None):
         }
 
     def decorator(view_class):
-        original_dispatch = view_class.dispatch
-
-        def rate_limited_dispatch(self, request, *args, **kwargs):
-            method = request.method
-            if method not in requests:
-                return original_dispatch(self, request, *args, **kwargs)
-
-            key_prefix = f"{self.__class__.__name__}_{method}"
-            return rate_limit(
-                requests=requests[method],
+        limiters = {
+            method: RateLimiter(
+                requests=limit,
                 interval=interval[method],
-                key_prefix=key_prefix
-            )(original_dispatch)(self, request, *args, **kwargs)
+                key_prefix=f'{view_class.__name__}_{method}'
+            )
+            for method, limit in requests.items()
+        }
+        original_initial = view_class.initial
+
+        def rate_limited_initial(self, request, *args, **kwargs):
+            limiter = limiters.get(request.method)
+            if limiter is not None:
+                self.perform_authentication(request)
+                limiter.check(request)
+            return original_initial(self, request, *args, **kwargs)
 
-        view_class.dispatch = rate_limited_dispatch
+        view_class.initial = rate_limited_initial
         return view_class
 
     return decorator
@@ -0,0 +1,88 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from . import pdf
+
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+PDF_TITLE = 'Список покупок'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_txt(ingredients):
+    separator = ''
+    for ingredient in ingredients:
+        yield (
+            f'{separator}{ingredient["name"]} '
+            f'({ingredient["measurement_unit"]}) - '
+            f'{ingredient["amount"]}'
+        )
+        separator = '\n'
+
+
+def iter_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['amount'],
+        ))
+
+
+def iter_json(ingredients):
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps(
+            {
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['measurement_unit'],
+                'amount': ingredient['amount'],
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+def iter_pdf(ingredients):
+    return pdf.iter_pdf(PDF_TITLE, (
+        f'{ingredient["name"]} ({ingredient["measurement_unit"]}) - '
+        f'{ingredient["amount"]}'
+        for ingredient in ingredients
+    ))
+
+
+EXPORT_FORMATS = {
+    'txt': (iter_txt, 'text/plain; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'json': (iter_json, 'application/json'),
+}
+if pdf.pdf_available():
+    EXPORT_FORMATS['pdf'] = (iter_pdf, 'application/pdf')
+
+
+def stream_shopping_list(ingredients, export_format='txt'):
+    """
+    Потоковая выгрузка списка покупок в выбранном формате.
+
+    ingredients — итератор словарей с ключами name, measurement_unit
+    и amount. Строки отдаются клиенту по мере чтения из базы.
+    """
+    generator, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        generator(ingredients),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{export_format}"'
+    )
+    return response
@@ -0,0 +1,149 @@
+"""
+Лента рецептов авторов из подписок пользователя.
+
+Большинство пользователей читает ленту из базы запросом
+author_id IN (подписки) по ключу (pub_date, id). Для пользователей
+с FEED_CACHE_MIN_FOLLOWING и более подписками такой запрос
+сливает много авторов, поэтому последние FEED_CACHE_SIZE рецептов
+их ленты хранятся в Redis в отсортированном множестве feed:<id>.
+Множество заполняется при первом чтении, а новые рецепты
+добавляются в него при публикации. При изменении подписок оно
+удаляется и строится заново.
+"""
+import calendar
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+from recipes.models import Recipe
+from users.models import Follow
+
+from .constants import (
+    FEED_CACHE_MIN_FOLLOWING, FEED_CACHE_SIZE, FEED_CACHE_TTL,
+    FEED_PUSH_BATCH_SIZE,
+)
+
+# Рецепт добавляется только в уже построенные ленты: остальные
+# построятся из базы при чтении. Старые записи сверх размера
+# ленты удаляются.
+FEED_PUSH_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', key, ARGV[1], ARGV[2])
+        redis.call('ZREMRANGEBYRANK', key, 0, -tonumber(ARGV[3]) - 1)
+    end
+end
+"""
+
+_push_script = None
+
+
+def get_key(user_id):
+    return f'feed:{user_id}'
+
+
+def get_score(pub_date):
+    """Время публикации в микросекундах: целое, точное во float."""
+    return (
+        calendar.timegm(pub_date.utctimetuple()) * 10 ** 6
+        + pub_date.microsecond
+    )
+
+
+def get_member(recipe_id):
+    # Дополнение нулями: при равном score Redis сравнивает строки,
+    # и порядок совпадает с порядком по id.
+    return f'{int(recipe_id):020d}'
+
+
+def build(connection, user):
+    """Заполняет ленту из базы; возвращает False, если она пуста."""
+    recipes = Recipe.objects.filter(
+        author_id__in=Follow.objects.filter(user=user).values('author_id')
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    mapping = {
+        get_member(pk): get_score(pub_date)
+        for pk, pub_date in recipes[:FEED_CACHE_SIZE]
+    }
+    if not mapping:
+        return False
+    key = get_key(user.pk)
+    with connection.pipeline() as pipe:
+        pipe.delete(key)
+        pipe.zadd(key, mapping)
+        pipe.expire(key, FEED_CACHE_TTL)
+        pipe.execute()
+    return True
+
+
+def get_cached_ids(user, cursor, count):
+    """
+    До count id рецептов ленты после курсора (pub_date, id) из Redis.
+
+    Возвращает None, если лента пользователя читается из базы:
+    подписок мало, лента пуста или страница выходит за пределы
+    сохраненных FEED_CACHE_SIZE записей.
+    """
+    connection = get_redis_connection('default')
+    key = get_key(user.pk)
+    size = connection.zcard(key)
+    if not size:
+        if Follow.objects.filter(user=user).count() < (
+            FEED_CACHE_MIN_FOLLOWING
+        ) or not build(connection, user):
+            return None
+        size = connection.zcard(key)
+
+    rank = None
+    if cursor is not None:
+        rank = connection.zrevrank(key, get_member(cursor[1]))
+    if cursor is None:
+        members = connection.zrevrange(key, 0, count - 1)
+    elif rank is not None:
+        members = connection.zrevrange(key, rank + 1, rank + count)
+    else:
+        # Рецепта курсора уже нет в ленте: продолжаем по времени.
+        pub_date = parse_datetime(cursor[0])
+        if pub_date is None:
+            return None
+        members = connection.zrevrangebyscore(
+            key, f'({get_score(pub_date)}', '-inf', start=0, num=count
+        )
+    if len(members) < count and size >= FEED_CACHE_SIZE:
+        # Старые записи обрезаны: продолжение есть только в базе.
+        return None
+    return [int(member) for member in members]
+
+
+def push(recipe):
+    """Добавляет рецепт в построенные ленты подписчиков автора."""
+    global _push_script
+    if _push_script is None:
+        _push_script = get_redis_connection('default').register_script(
+            FEED_PUSH_SCRIPT
+        )
+    keys = [
+        get_key(user_id) for user_id in Follow.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True).iterator()
+    ]
+    args = [get_score(recipe.pub_date), get_member(recipe.pk),
+            FEED_CACHE_SIZE]
+    for start in range(0, len(keys), FEED_PUSH_BATCH_SIZE):
+        _push_script(
+            keys=keys[start:start + FEED_PUSH_BATCH_SIZE], args=args
+        )
+
+
+def push_on_commit(recipe):
+    transaction.on_commit(lambda: push(recipe))
+
+
+def invalidate_feeds(user_ids):
+    """Удаляет ленты пользователей после коммита: подписки изменились."""
+    keys = [get_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(
+            lambda: get_redis_connection('default').delete(*keys)
+        )
@@ -0,0 +1,107 @@
+import io
+import os
+import uuid
+from datetime import timedelta
+
+from django import forms
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from drf_extra_fields import fields
+from PIL import Image
+from rest_framework import serializers
+
+from .constants import UPLOAD_TTL
+from .images import get_variants_field, thumbnail_name
+from .models import ImageUpload
+from .uploads import IMAGE_EXTENSIONS, INVALID_FORMAT_MESSAGE
+
+
+class Base64ImageField(fields.Base64ImageField):
+    """
+    Изображение в base64 или id загрузки из /api/uploads/.
+
+    Полного разбора Pillow в запросе нет: Pillow читает только
+    заголовок файла, как ImageUploadHandler, а само изображение
+    декодируется при построении миниатюр в фоне (см. api.images).
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('_DjangoImageField', forms.FileField)
+        super().__init__(*args, **kwargs)
+
+    def get_file_extension(self, filename, decoded_file):
+        try:
+            # open() читает только заголовок: формат и размеры.
+            with Image.open(io.BytesIO(decoded_file)) as image:
+                image_format = image.format
+        except (OSError, Image.DecompressionBombError):
+            image_format = None
+        if image_format not in IMAGE_EXTENSIONS:
+            raise serializers.ValidationError(INVALID_FORMAT_MESSAGE)
+        return IMAGE_EXTENSIONS[image_format]
+
+    def to_internal_value(self, data):
+        upload = self.get_upload(data)
+        if upload is None:
+            return super().to_internal_value(data)
+        # Размер загрузки ограничен MAX_IMAGE_SIZE, содержимое читается
+        # в память целиком, и файл закрывается сразу.
+        with upload.file.open('rb') as file:
+            return ContentFile(
+                file.read(), name=os.path.basename(upload.file.name)
+            )
+
+    def get_upload(self, data):
+        """Загрузка текущего пользователя по id или None для base64."""
+        try:
+            upload_id = uuid.UUID(str(data))
+        except ValueError:
+            return None
+        request = self.context.get('request')
+        upload = ImageUpload.objects.filter(
+            pk=upload_id,
+            user_id=getattr(request.user, 'pk', None) if request else None,
+            created__gte=timezone.now() - timedelta(seconds=UPLOAD_TTL),
+        ).first()
+        if upload is None:
+            raise serializers.ValidationError('Загрузка не найдена.')
+        return upload
+
+
+class SrcsetField(serializers.Field):
+    """
+    Миниатюры изображения: {формат: 'url 320w, url 640w, ...'}.
+
+    Пока миниатюры не построены, возвращает None.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        return build_srcset(
+            image.storage,
+            image.name,
+            getattr(instance, get_variants_field(self.image_field)),
+            self.context.get('request'),
+        )
+
+
+def build_srcset(storage, name, variants, request=None):
+    """Значение SrcsetField по имени исходного файла и его миниатюрам."""
+    if not name or not variants:
+        return None
+    srcset = {}
+    for image_format, widths in variants.items():
+        urls = []
+        for width in widths:
+            url = storage.url(thumbnail_name(name, width, image_format))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls.append(f'{url} {width}w')
+        srcset[image_format] = ', '.join(urls)
+    return srcset
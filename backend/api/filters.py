@@ -1,6 +1,11 @@
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity,
+)
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Tag
+from recipes.constants import SEARCH_CONFIG
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
 
 
 class RecipeFilter(FilterSet):
@@ -11,12 +16,76 @@ class RecipeFilter(FilterSet):
         conjoined=False
     )
     author = filters.NumberFilter(field_name='author__id')
-    is_favorited = filters.BooleanFilter()
-    is_in_shopping_cart = filters.BooleanFilter()
+    is_favorited = filters.BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = filters.BooleanFilter(
+        method='filter_is_in_shopping_cart'
+    )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering',
+        )
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию (русская морфология)
+        и нечеткий поиск по названию через pg_trgm.
+
+        Оба условия обслуживаются GIN-индексами, результаты
+        упорядочены по релевантности.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), query),
+            similarity=TrigramSimilarity('name', value),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).order_by('-rank', '-similarity', '-pub_date', '-id')
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        Сортировка по числу добавлений в избранное (индекс
+        recipe_popular_idx).
+
+        Счетчики меняются постоянно, поэтому в этом режиме работает
+        постраничная пагинация, а не курсор, и ответы не кэшируются
+        (RecipeViewSet.should_cache).
+        """
+        return queryset.order_by('-favorites_count', '-pub_date', '-id')
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_user_relation(queryset, Favorite, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self._filter_user_relation(queryset, ShoppingCart, value)
+
+    def _filter_user_relation(self, queryset, model, value):
+        """
+        Полусоединение с Favorite/ShoppingCart по (user_id, recipe_id).
+
+        Подзапрос использует уникальный индекс связи пользователя
+        и рецепта. Анонимному пользователю сразу возвращается
+        пустой результат без обращения к базе.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        relation = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        )
+        return queryset.filter(relation if value else ~relation)
 
 
 class IngredientFilter(FilterSet):
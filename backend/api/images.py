@@ -0,0 +1,159 @@
+"""
+Фоновое построение миниатюр загруженных изображений.
+
+После коммита транзакции с новым изображением задача уходит в пул
+процессов: исходник декодируется, поворачивается по EXIF и
+сохраняется в нескольких ширинах в WebP и JPEG без метаданных.
+Готовые варианты записываются в поле <поле>_variants модели
+в виде {формат: [ширины]}.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .cache import bump_generation
+from .constants import THUMBNAIL_FORMATS, THUMBNAIL_QUALITY, THUMBNAIL_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def thumbnail_name(name, width, image_format):
+    """Имя файла миниатюры для исходного файла name."""
+    root, _ = os.path.splitext(name)
+    return f'thumbnails/{root}_{width}w.{image_format}'
+
+
+def get_variants_field(field):
+    return f'{field}_variants'
+
+
+def _get_formats():
+    Image.init()
+    return [
+        image_format for image_format in THUMBNAIL_FORMATS
+        if image_format.upper() in Image.SAVE
+    ]
+
+
+def _prepare(image, image_format):
+    if image_format == 'jpeg' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image
+
+
+def _save(image, name, image_format):
+    output = BytesIO()
+    # exif и icc_profile не передаются, поэтому метаданные
+    # исходника в миниатюры не попадают.
+    image.save(
+        output,
+        format=image_format.upper(),
+        quality=THUMBNAIL_QUALITY,
+        optimize=True,
+        progressive=image_format == 'jpeg',
+    )
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(output.getvalue()))
+
+
+def make_thumbnails(label, pk, field, name):
+    """
+    Строит миниатюры файла name и записывает их список в модель.
+
+    Выполняется в процессе пула. Список записывается, только если
+    у объекта все еще то же изображение.
+    """
+    model = apps.get_model(label)
+    try:
+        with model._meta.get_field(field).storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Не удалось открыть изображение %s', name)
+        return
+    image = ImageOps.exif_transpose(image)
+    image = image.convert(
+        'RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB'
+    )
+
+    widths = sorted({min(width, image.width) for width in THUMBNAIL_WIDTHS})
+    formats = _get_formats()
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for image_format in formats:
+            _save(
+                _prepare(resized, image_format),
+                thumbnail_name(name, width, image_format),
+                image_format
+            )
+
+    updated = model.objects.filter(pk=pk, **{field: name}).update(**{
+        get_variants_field(field): {
+            image_format: widths for image_format in formats
+        }
+    })
+    if updated:
+        bump_generation(model)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: дочерние процессы не наследуют соединения с базой
+        # и настраивают Django заново.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Ошибка построения миниатюр', exc_info=future.exception()
+        )
+
+
+def schedule_thumbnails(instance, field):
+    """Ставит построение миниатюр в очередь после коммита."""
+    args = (
+        instance._meta.label,
+        instance.pk,
+        field,
+        getattr(instance, field).name,
+    )
+
+    def submit():
+        if not settings.IMAGE_WORKERS:
+            make_thumbnails(*args)
+            return
+        try:
+            future = get_executor().submit(make_thumbnails, *args)
+        except BrokenProcessPool:
+            # Пул не восстанавливается после аварийного завершения
+            # процесса: создаем новый.
+            global _executor
+            _executor = None
+            future = get_executor().submit(make_thumbnails, *args)
+        future.add_done_callback(_log_failure)
+
+    transaction.on_commit(submit)
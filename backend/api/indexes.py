@@ -0,0 +1,68 @@
+"""
+Индекс ингредиентов в памяти процесса для автодополнения.
+
+Названия хранятся отсортированными в нормализованном виде
+(casefold, «ё» → «е»), поиск по префиксу выполняется бинарным
+поиском. Индекс перестраивается, когда меняется поколение модели
+Ingredient (см. api.cache), поэтому база нужна только при первом
+запросе и после изменений справочника.
+"""
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+
+from .cache import get_generations
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._state = (None, [], [])
+
+    def _get_state(self):
+        generation = get_generations((Ingredient,))[Ingredient]
+        if self._state[0] != generation:
+            entries = sorted(
+                (normalize(name), pk, name, measurement_unit)
+                for pk, name, measurement_unit
+                in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).order_by().iterator()
+            )
+            self._state = (
+                generation,
+                [entry[0] for entry in entries],
+                [
+                    {'id': pk, 'name': name, 'measurement_unit': unit}
+                    for _, pk, name, unit in entries
+                ],
+            )
+        return self._state
+
+    def search(self, query, limit=None):
+        """
+        Ингредиенты, название которых начинается с query, а за ними —
+        содержащие query в середине названия.
+        """
+        _, keys, rows = self._get_state()
+        query = normalize(query.strip())
+        results = []
+        position = bisect_left(keys, query)
+        while position < len(keys) and keys[position].startswith(query):
+            results.append(rows[position])
+            if limit is not None and len(results) >= limit:
+                return results
+            position += 1
+        for key, row in zip(keys, rows):
+            if query in key and not key.startswith(query):
+                results.append(row)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+
+ingredient_index = IngredientIndex()
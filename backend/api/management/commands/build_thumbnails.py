@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.images import get_variants_field, make_thumbnails
+from api.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Построение миниатюр для изображений, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перестроить миниатюры для всех изображений',
+        )
+
+    def handle(self, *args, **options):
+        for model, field in IMAGE_FIELDS.items():
+            queryset = model.objects.exclude(
+                **{f'{field}__isnull': True}
+            ).exclude(**{field: ''})
+            if not options['all']:
+                queryset = queryset.filter(
+                    **{get_variants_field(field): {}}
+                )
+            count = 0
+            for pk, name in queryset.values_list('pk', field).iterator():
+                make_thumbnails(model._meta.label, pk, field, name)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: обработано {count}'
+            ))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.constants import UPLOAD_TTL
+from api.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = 'Удаление загрузок изображений старше UPLOAD_TTL вместе с файлами'
+
+    def handle(self, *args, **options):
+        expired = ImageUpload.objects.filter(
+            created__lt=timezone.now() - timedelta(seconds=UPLOAD_TTL)
+        )
+        count = 0
+        for upload in expired.iterator():
+            upload.file.delete(save=False)
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {count}'))
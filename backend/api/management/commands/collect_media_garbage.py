@@ -0,0 +1,96 @@
+import os
+import re
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.constants import MEDIA_GC_GRACE
+from api.signals import IMAGE_FIELDS
+
+THUMBNAIL_SUFFIX = re.compile(r'_\d+w\.\w+$')
+
+
+def walk(storage, directory):
+    """Все файлы каталога хранилища, включая вложенные."""
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from walk(storage, f'{directory}/{name}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление изображений и миниатюр, на которые не ссылается '
+        'ни одна запись'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько файлов будет удалено',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=MEDIA_GC_GRACE,
+            help='Не трогать файлы моложе указанного числа секунд',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        threshold = timezone.now() - timedelta(seconds=options['grace'])
+
+        # Ссылки считаются одним проходом по таблицам: файл удаляется,
+        # только если на него не ссылается ни одна запись.
+        references = Counter()
+        sources = []
+        for model, field in IMAGE_FIELDS.items():
+            references.update(
+                model.objects.exclude(**{f'{field}__isnull': True}).exclude(
+                    **{field: ''}
+                ).values_list(field, flat=True).iterator()
+            )
+            model_field = model._meta.get_field(field)
+            sources.append(
+                (model_field.storage, model_field.upload_to.strip('/'))
+            )
+        roots = {os.path.splitext(name)[0] for name in references}
+
+        candidates = [
+            (storage, name)
+            for storage, directory in sources
+            for name in walk(storage, directory)
+            if name not in references
+        ] + [
+            (default_storage, name)
+            for name in walk(default_storage, 'thumbnails')
+            if THUMBNAIL_SUFFIX.sub(
+                '', name[len('thumbnails/'):]
+            ) not in roots
+        ]
+
+        deleted = 0
+        for storage, name in candidates:
+            if storage.get_modified_time(name) > threshold:
+                continue
+            if not dry_run:
+                storage.delete(name)
+            deleted += 1
+
+        shared = sum(1 for count in references.values() if count > 1)
+        self.stdout.write(
+            f'Файлов со ссылками: {len(references)}, '
+            f'из них общих: {shared}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет удалено" if dry_run else "Удалено"} '
+            f'файлов: {deleted}'
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:28
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='uploads/', verbose_name='Файл')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Загружено')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Загрузка изображения',
+                'verbose_name_plural': 'Загрузки изображений',
+            },
+        ),
+    ]
@@ -1,15 +1,141 @@
+import hashlib
+from urllib.parse import urlencode
+
 from django.conf import settings
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_generations
 
 
 class CachedViewSetMixin:
-    """Миксин для кэширования результатов viewset."""
+    """
+    Миксин для кэширования результатов viewset.
+
+    Ключ кэша строится по схеме, хосту и пути, значимым параметрам
+    запроса (фильтры и пагинация) и поколениям моделей из
+    cache_models. Схема и хост входят в ключ, потому что ответ
+    содержит абсолютные ссылки на изображения и страницы; остальные
+    заголовки клиента на ключ не влияют, а изменение модели сразу
+    делает старые ответы недоступными.
+
+    При cache_anonymous_only кэшируются только ответы анонимным
+    пользователям: для остальных ответ зависит от их подписок,
+    избранного и списка покупок.
+    """
+    cache_models = ()
+    cache_anonymous_only = False
 
-    @method_decorator(cache_page(settings.CACHE_TTL))
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
 
-    @method_decorator(cache_page(settings.CACHE_TTL))
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def should_cache(self, request):
+        return not (
+            self.cache_anonymous_only and request.user.is_authenticated
+        )
+
+    def get_cache_models(self):
+        return self.cache_models or (self.get_queryset().model,)
+
+    def get_cache_query_params(self):
+        params = set()
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is not None:
+            params.update(filterset_class.base_filters)
+        if self.paginator is not None:
+            params.update(
+                getattr(self.paginator, name)
+                for name in (
+                    'page_query_param',
+                    'page_size_query_param',
+                    'cursor_query_param',
+                )
+                if getattr(self.paginator, name, None)
+            )
+        return params
+
+    def get_cache_key(self, request, generations):
+        query_params = self.get_cache_query_params()
+        query = urlencode(sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name in query_params
+            for value in values
+        ))
+        versions = ','.join(
+            f'{model._meta.label_lower}={generation}'
+            for model, generation in sorted(
+                generations.items(), key=lambda item: item[0]._meta.label
+            )
+        )
+        digest = hashlib.md5(
+            f'{request.scheme}://{request.get_host()}{request.path}'
+            f'?{query}|{versions}'.encode()
+        ).hexdigest()
+        return f'response:{digest}'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """
+        Отдает ответ из кэша и поддерживает условные запросы.
+
+        ETag — хэш ключа кэша, Last-Modified — время последнего
+        изменения моделей из cache_models. Оба значения вычисляются
+        без обращения к базе, поэтому ответ 304 тоже не трогает ее.
+        """
+        if not self.should_cache(request):
+            return handler(request, *args, **kwargs)
+
+        generations = get_generations(self.get_cache_models())
+        key = self.get_cache_key(request, generations)
+        etag = quote_etag(key.split(':', 1)[1])
+        last_modified = max(generations.values()) // 1000
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.CACHE_TTL)
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if self.cache_anonymous_only:
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class RowListMixin:
+    """
+    Список через сериализатор строк из api.rows.
+
+    Выборка с фильтрами и пагинацией строится как обычно, но
+    читается через .values() и сериализуется row_serializer_class
+    без создания моделей и полей DRF на каждую строку.
+    """
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.row_serializer_class(self.get_serializer_context())
+        queryset = serializer.get_values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page)
+            )
+        return Response(serializer.to_representation(queryset))
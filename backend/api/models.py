@@ -0,0 +1,29 @@
+import uuid
+
+from django.db import models
+
+from users.models import User
+
+
+class ImageUpload(models.Model):
+    """
+    Изображение, загруженное отдельно от рецепта или аватара.
+
+    В JSON API вместо base64 можно передать id загрузки.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name='Пользователь',
+    )
+    file = models.FileField('Файл', upload_to='uploads/')
+    created = models.DateTimeField('Загружено', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return str(self.id)
@@ -1,5 +1,205 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .constants import PAGINATION_COUNT_CACHE_TTL
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator с кэшированным количеством объектов.
+
+    COUNT(*) выполняется не на каждой странице, а раз в
+    PAGINATION_COUNT_CACHE_TTL секунд для одного и того же запроса,
+    поэтому количество в ответе может быть приблизительным.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+        try:
+            sql = str(query)
+        except EmptyResultSet:
+            return 0
+        key = f'pagination_count:{hashlib.md5(sql.encode()).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, PAGINATION_COUNT_CACHE_TTL)
+        return count
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с необязательным режимом курсора.
+
+    Если в запросе передан параметр cursor (в том числе пустой),
+    а у представления задан cursor_ordering, выборка идет по ключу
+    (keyset): WHERE (поле, id) после курсора ORDER BY ... LIMIT.
+    Такой запрос не зависит от глубины страницы и не требует COUNT.
+    Размер страницы по-прежнему задается параметром limit.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    django_paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = self.get_cursor_ordering(
+            queryset, request, view
+        )
+        if self.cursor_ordering is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.get_cursor_filter(
+                queryset.model, self.decode_cursor(cursor)
+            ))
+        page = list(queryset.order_by(*self.cursor_ordering)[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page_objects = page[:page_size]
+        return self.page_objects
+
+    def get_cursor_ordering(self, queryset, request, view):
+        """
+        Порядок для режима курсора или None для постраничного режима.
+
+        Курсор используется, только если выборка упорядочена так же,
+        как cursor_ordering представления: при поиске и других
+        сортировках остается постраничный режим.
+        """
+        ordering = tuple(getattr(view, 'cursor_ordering', None) or ())
+        if (
+            not ordering
+            or self.cursor_query_param not in request.query_params
+        ):
+            return None
+        current = tuple(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if current and current != ordering:
+            return None
+        return ordering
+
+    def get_cursor_filter(self, model, values):
+        """Условие «строго после курсора» для двух полей сортировки."""
+        conditions = []
+        for name, value in zip(self.cursor_ordering, values):
+            field = name.lstrip('-')
+            try:
+                value = model._meta.get_field(field).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound('Некорректный курсор.')
+            conditions.append(
+                (field, 'lt' if name.startswith('-') else 'gt', value)
+            )
+        (first, lookup, first_value), (second, second_lookup, second_value) = (
+            conditions
+        )
+        return Q(**{f'{first}__{lookup}e': first_value}) & (
+            Q(**{f'{first}__{lookup}': first_value})
+            | Q(**{f'{second}__{second_lookup}': second_value})
+        )
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.cursor_ordering:
+            # Страница может состоять из строк .values() (api.rows).
+            field = name.lstrip('-')
+            value = obj[field] if isinstance(obj, dict) else getattr(
+                obj, field
+            )
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Некорректный курсор.')
+        if not isinstance(values, list) or len(values) != 2 or not all(
+            isinstance(value, (str, int)) and not isinstance(value, bool)
+            for value in values
+        ):
+            raise NotFound('Некорректный курсор.')
+        return values
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.page_objects[-1])
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(CustomPageNumberPagination):
+    """
+    Курсорная пагинация ленты подписок.
+
+    Лента всегда читается по ключу (pub_date, id). Если id страницы
+    уже известны из кэша ленты (api.feed), строки выбираются по ним
+    без сортировки и слияния рецептов всех авторов.
+    """
+    cursor_ordering = ('-pub_date', '-id')
+
+    def paginate_feed(self, queryset, request, get_cached_ids):
+        """
+        get_cached_ids(курсор, количество) — id следующих рецептов
+        ленты или None, если страницу нужно читать из базы.
+        """
+        page_size = self.get_page_size(request)
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        values = condition = None
+        if cursor:
+            values = self.decode_cursor(cursor)
+            condition = self.get_cursor_filter(queryset.model, values)
+
+        ids = get_cached_ids(values, page_size + 1)
+        if ids is not None:
+            rows = {
+                row['id']: row
+                for row in queryset.filter(id__in=ids[:page_size])
+            }
+            # Если рецепт удален или пользователь отписался от автора,
+            # кэш устарел, и страница читается из базы.
+            if len(rows) == len(ids[:page_size]):
+                self.has_next = len(ids) > page_size
+                self.page_objects = [rows[pk] for pk in ids[:page_size]]
+                return self.page_objects
+
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        page = list(queryset.order_by(*self.cursor_ordering)[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page_objects = page[:page_size]
+        return self.page_objects
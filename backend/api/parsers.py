@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONParser(JSONParser):
+    """
+    Парсер JSON на orjson.
+
+    orjson разбирает только UTF-8; для других кодировок и при
+    отсутствии orjson используется стандартный JSONParser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
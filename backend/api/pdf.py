@@ -0,0 +1,257 @@
+"""
+Потоковая запись простого текстового PDF.
+
+Страницы отдаются по мере заполнения: смещения объектов считаются
+на ходу, а таблица xref, дерево страниц и шрифты записываются в
+конце файла. В память попадает только текущая страница.
+
+Кириллица выводится встроенным шрифтом DejaVu Sans (api/fonts).
+Шрифт встраивается подмножествами по 256 символов: reportlab
+разбирает TrueType и строит подмножества, а объекты PDF
+формируются здесь.
+"""
+import os
+import threading
+import zlib
+from functools import lru_cache
+
+try:
+    from reportlab.pdfbase.ttfonts import TTFontFile, makeToUnicodeCMap
+except ImportError:
+    TTFontFile = makeToUnicodeCMap = None
+
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 56
+FONT_SIZE = 11
+TITLE_FONT_SIZE = 16
+LEADING = 16
+SUBSET_SIZE = 256
+
+# makeSubset читает файл шрифта через общий указатель позиции.
+_subset_lock = threading.Lock()
+
+
+def pdf_available():
+    return TTFontFile is not None
+
+
+@lru_cache(maxsize=None)
+def get_font():
+    return TTFontFile(FONT_PATH)
+
+
+def _hex(data):
+    return b'<' + data.hex().encode() + b'>'
+
+
+def _number(value):
+    return ('%.2f' % value).rstrip('0').rstrip('.').encode()
+
+
+class PDFStreamWriter:
+    """
+    Пишет документ частями: каждый метод возвращает готовые байты.
+
+    Объекты 1 и 2 — каталог и дерево страниц, они записываются
+    последними, когда известен список страниц.
+    """
+
+    def __init__(self):
+        self.font = get_font()
+        self.offsets = {}
+        self.position = 0
+        self.next_number = 3
+        self.pages = []
+        self.subsets = []
+        self.subset_numbers = []
+        self.codes = {}
+
+    def reserve(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def output(self, data):
+        self.position += len(data)
+        return data
+
+    def write_object(self, number, body):
+        self.offsets[number] = self.position
+        return self.output(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def write_stream(self, number, dictionary, content, compress=True):
+        if compress:
+            content = zlib.compress(content)
+            dictionary += b' /Filter /FlateDecode'
+        return self.write_object(number, b'<< %s /Length %d >>\nstream\n%s'
+                                 b'\nendstream' % (dictionary, len(content),
+                                                   content))
+
+    def start(self):
+        return self.output(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def encode(self, text):
+        """Текст -> [(номер подмножества шрифта, коды символов)]."""
+        runs = []
+        for char in text:
+            code = self.codes.get(char)
+            if code is None:
+                if not self.subsets or len(self.subsets[-1]) == SUBSET_SIZE:
+                    self.subsets.append([])
+                    self.subset_numbers.append(self.reserve())
+                code = self.codes[char] = (
+                    len(self.subsets) - 1, len(self.subsets[-1])
+                )
+                self.subsets[-1].append(ord(char))
+            subset, value = code
+            if runs and runs[-1][0] == subset:
+                runs[-1][1].append(value)
+            else:
+                runs.append((subset, bytearray([value])))
+        return runs
+
+    def text_width(self, text, size):
+        widths = self.font.charWidths
+        default = self.font.defaultWidth
+        return sum(widths.get(ord(char), default) for char in text) * (
+            size / 1000
+        )
+
+    def wrap(self, text, size, width):
+        """Разбивает строку по словам, чтобы она помещалась в width."""
+        lines = []
+        line = ''
+        for word in text.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if self.text_width(candidate, size) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ''
+            # Слово длиннее строки переносится по символам.
+            for char in word:
+                if line and self.text_width(line + char, size) > width:
+                    lines.append(line)
+                    line = ''
+                line += char
+        lines.append(line)
+        return lines
+
+    def text_operators(self, x, y, text, size):
+        operators = [b'BT %s %s Td' % (_number(x), _number(y))]
+        for subset, codes in self.encode(text):
+            operators.append(
+                b'/F%d %d Tf %s Tj' % (subset, size, _hex(bytes(codes)))
+            )
+        operators.append(b'ET')
+        return b' '.join(operators)
+
+    def write_page(self, content):
+        content_number = self.reserve()
+        page_number = self.reserve()
+        self.pages.append(page_number)
+        fonts = b' '.join(
+            b'/F%d %d 0 R' % (index, number)
+            for index, number in enumerate(self.subset_numbers)
+        )
+        return self.write_stream(content_number, b'', content) + (
+            self.write_object(page_number, (
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << %s >> >> /Contents %d 0 R >>'
+            ) % (PAGE_WIDTH, PAGE_HEIGHT, fonts, content_number))
+        )
+
+    def write_fonts(self):
+        font = self.font
+        name = font.name.decode('latin-1')
+        chunks = []
+        for index, (subset, number) in enumerate(
+            zip(self.subsets, self.subset_numbers)
+        ):
+            tag = ''.join(
+                chr(ord('A') + (index // 26 ** power) % 26)
+                for power in range(6)
+            )
+            base_name = f'{tag}+{name}'.encode('latin-1')
+            descriptor, font_file, to_unicode = (
+                self.reserve(), self.reserve(), self.reserve()
+            )
+            with _subset_lock:
+                data = font.makeSubset(subset)
+            widths = b' '.join(
+                _number(font.charWidths.get(code, font.defaultWidth))
+                for code in subset
+            )
+            chunks.append(self.write_object(number, (
+                b'<< /Type /Font /Subtype /TrueType /BaseFont /%s '
+                b'/FirstChar 0 /LastChar %d /Widths [%s] '
+                b'/FontDescriptor %d 0 R /ToUnicode %d 0 R >>'
+            ) % (base_name, len(subset) - 1, widths, descriptor, to_unicode)))
+            chunks.append(self.write_object(descriptor, (
+                b'<< /Type /FontDescriptor /FontName /%s /Flags %d '
+                b'/FontBBox [%s] /ItalicAngle %s /Ascent %s /Descent %s '
+                b'/CapHeight %s /StemV %d /FontFile2 %d 0 R >>'
+            ) % (
+                base_name, font.flags,
+                b' '.join(_number(value) for value in font.bbox),
+                _number(font.italicAngle), _number(font.ascent),
+                _number(font.descent), _number(font.capHeight),
+                font.stemV, font_file,
+            )))
+            chunks.append(self.write_stream(
+                font_file, b'/Length1 %d' % len(data), data
+            ))
+            chunks.append(self.write_stream(
+                to_unicode, b'',
+                makeToUnicodeCMap(base_name.decode('latin-1'), subset)
+                .encode('latin-1'),
+            ))
+        return b''.join(chunks)
+
+    def finish(self):
+        data = self.write_fonts()
+        data += self.write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                                  % (b' '.join(b'%d 0 R' % number
+                                               for number in self.pages),
+                                     len(self.pages)))
+        data += self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = self.position
+        data += b'xref\n0 %d\n0000000000 65535 f \n' % self.next_number
+        data += b''.join(
+            b'%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, self.next_number)
+        )
+        data += (
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (self.next_number, xref)
+        )
+        return self.output(data)
+
+
+def iter_pdf(title, lines):
+    """
+    Части PDF-документа со строками lines под заголовком title.
+
+    Очередная страница отдается, как только заполнена, поэтому
+    строки можно читать из базы по мере вывода.
+    """
+    writer = PDFStreamWriter()
+    yield writer.start()
+    width = PAGE_WIDTH - 2 * MARGIN
+    top = PAGE_HEIGHT - MARGIN
+    y = top - TITLE_FONT_SIZE
+    page = [writer.text_operators(MARGIN, y, title, TITLE_FONT_SIZE)]
+    y -= LEADING * 2
+    for line in lines:
+        for part in writer.wrap(line, FONT_SIZE, width):
+            if y < MARGIN:
+                yield writer.write_page(b'\n'.join(page))
+                page = []
+                y = top - FONT_SIZE
+            page.append(writer.text_operators(MARGIN, y, part, FONT_SIZE))
+            y -= LEADING
+    yield writer.write_page(b'\n'.join(page))
+    yield writer.finish()
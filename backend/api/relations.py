@@ -0,0 +1,109 @@
+"""
+Пакетное добавление и удаление связей пользователя с объектами.
+
+Связи (избранное, список покупок, подписки) вставляются одним
+INSERT ... ON CONFLICT DO NOTHING и удаляются одним DELETE. Оба
+запроса возвращают id затронутых объектов через RETURNING, поэтому
+результат по каждому элементу известен без дополнительных проверок.
+Сигналы моделей при этом не отправляются, поэтому счетчики
+(recipes.counters) обновляются здесь же.
+"""
+from django.db import connection
+
+from recipes import counters
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def _columns(model, field):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field(field).column),
+    )
+
+
+def insert_relations(model, user_id, field, target_ids):
+    """
+    Создает связи пользователя с объектами target_ids.
+
+    Возвращает множество id объектов, для которых связь создана;
+    уже существующие связи не изменяются.
+    """
+    if not target_ids:
+        return set()
+    table, user_column, target_column = _columns(model, field)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {target_column}) '
+            f'SELECT %s, target_id FROM unnest(%s) AS target_id '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [user_id, list(target_ids)]
+        )
+        added = {row[0] for row in cursor.fetchall()}
+    counters.rows_changed(model, added, 1)
+    return added
+
+
+def delete_relations(model, user_id, field, target_ids):
+    """
+    Удаляет связи пользователя с объектами target_ids.
+
+    Возвращает множество id объектов, связь с которыми была удалена.
+    """
+    if not target_ids:
+        return set()
+    table, user_column, target_column = _columns(model, field)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE {user_column} = %s AND {target_column} = ANY(%s) '
+            f'RETURNING {target_column}',
+            [user_id, list(target_ids)]
+        )
+        removed = {row[0] for row in cursor.fetchall()}
+    counters.rows_changed(model, removed, -1)
+    return removed
+
+
+def apply_batch(model, user, field, targets, add=(), remove=(),
+                forbidden=()):
+    """
+    Добавляет и удаляет связи пользователя.
+
+    Вызывается внутри транзакции вместе с зависимыми обновлениями.
+
+    targets — queryset объектов, с которыми можно создать связь,
+    forbidden — id, недопустимые для добавления (например, свой id
+    при подписке). Возвращает список результатов по каждому id
+    и множества добавленных и удаленных id.
+    """
+    found = set(
+        targets.filter(pk__in=add).values_list('pk', flat=True)
+    ) - set(forbidden)
+    added = insert_relations(
+        model, user.pk, field, [pk for pk in add if pk in found]
+    )
+    removed = delete_relations(model, user.pk, field, remove)
+
+    results = []
+    for pk in add:
+        if pk in forbidden:
+            result = FORBIDDEN
+        elif pk not in found:
+            result = NOT_FOUND
+        else:
+            result = ADDED if pk in added else EXISTS
+        results.append({'id': pk, 'action': 'add', 'status': result})
+    for pk in remove:
+        results.append({
+            'id': pk,
+            'action': 'remove',
+            'status': REMOVED if pk in removed else NOT_FOUND,
+        })
+    return results, added, removed
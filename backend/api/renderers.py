@@ -0,0 +1,97 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .pdf import iter_pdf, pdf_available
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class PlainTextRenderer(BaseRenderer):
+    """
+    Рендерер текстовых ответов.
+
+    Используется для согласования формата выгрузки списка покупок.
+    Сам файл отдается потоком в обход рендерера, поэтому через него
+    проходят только сообщения об ошибках.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def get_text(self, data):
+        if isinstance(data, dict):
+            return '\n'.join(str(value) for value in data.values())
+        return str(data)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.get_text(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендерер CSV для согласования формата выгрузки."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(PlainTextRenderer):
+    """
+    Рендерер PDF для согласования формата выгрузки.
+
+    Сообщение об ошибке отдается одностраничным PDF, чтобы ответ
+    соответствовал заявленному типу.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(iter_pdf('Ошибка', self.get_text(data).splitlines()))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson.
+
+    Вывод совпадает с JSONRenderer DRF: компактный JSON без
+    экранирования не-ASCII символов. Даты и прочие типы, которые
+    DRF кодирует по-своему, передаются его JSONEncoder. Для отступов
+    (application/json; indent=N), данных, которые orjson не умеет
+    кодировать, и при отсутствии orjson используется стандартный
+    рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Как в JSONRenderer: эти символы допустимы в JSON,
+        # но не в строковых литералах JavaScript.
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+SHOPPING_LIST_RENDERERS = (
+    PlainTextRenderer, CSVRenderer, ORJSONRenderer
+) + ((PDFRenderer,) if pdf_available() else ())
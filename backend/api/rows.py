@@ -0,0 +1,154 @@
+"""
+Сериализация только для чтения по строкам .values().
+
+Списки тегов, ингредиентов и рецептов строятся из словарей,
+которые возвращает .values(), без создания моделей и полей DRF
+на каждую строку. Результат совпадает с выводом TagSerializer,
+IngredientSerializer и RecipeSerializer.
+"""
+from recipes.models import Recipe, RecipeIngredient, Tag
+from users.models import Follow, User
+
+from .fields import build_srcset
+
+
+class RowSerializer:
+    """
+    Базовый сериализатор строк.
+
+    fields — столбцы .values() в порядке вывода; если строку
+    не нужно преобразовывать, она отдается как есть.
+    """
+    fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def get_values(self, queryset):
+        return queryset.values(*self.fields)
+
+    def to_representation(self, rows):
+        return list(rows)
+
+
+class TagRowSerializer(RowSerializer):
+    fields = ('id', 'name', 'slug')
+
+
+class IngredientRowSerializer(RowSerializer):
+    fields = ('id', 'name', 'measurement_unit')
+
+
+class RecipeRowSerializer(RowSerializer):
+    """Строки для RecipeViewSet.list в формате RecipeSerializer."""
+    fields = (
+        'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+        'pub_date', 'is_favorited', 'is_in_shopping_cart', 'author_id',
+        'author__email', 'author__username', 'author__first_name',
+        'author__last_name', 'author__avatar', 'author__avatar_variants',
+    )
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.request = self.context.get('request')
+        self.image_storage = Recipe._meta.get_field('image').storage
+        self.avatar_storage = User._meta.get_field('avatar').storage
+
+    def get_values(self, queryset):
+        # Связанные объекты читаются отдельными запросами по id
+        # страницы в to_representation.
+        return super().get_values(queryset.prefetch_related(None))
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        tags = self.get_tags(ids)
+        ingredients = self.get_ingredients(ids)
+        subscribed_ids = self.get_subscribed_ids()
+        return [
+            {
+                'id': row['id'],
+                'tags': tags.get(row['id'], []),
+                'author': self.get_author(row, subscribed_ids),
+                'ingredients': ingredients.get(row['id'], []),
+                'name': row['name'],
+                'image': self.get_url(self.image_storage, row['image']),
+                'image_srcset': build_srcset(
+                    self.image_storage,
+                    row['image'],
+                    row['image_variants'],
+                    self.request,
+                ),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'is_favorited': bool(row['is_favorited']),
+                'is_in_shopping_cart': bool(row['is_in_shopping_cart']),
+            }
+            for row in rows
+        ]
+
+    def get_tags(self, ids):
+        tags = {}
+        for recipe_id, *tag in (
+            Recipe.tags.through.objects.filter(recipe_id__in=ids)
+            .order_by(*(f'tag__{name}' for name in Tag._meta.ordering))
+            .values_list('recipe_id', 'tag_id', 'tag__name', 'tag__slug')
+        ):
+            tags.setdefault(recipe_id, []).append(
+                dict(zip(TagRowSerializer.fields, tag))
+            )
+        return tags
+
+    def get_ingredients(self, ids):
+        ingredients = {}
+        for recipe_id, ingredient_id, name, unit, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids)
+            .order_by('id')
+            .values_list(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount',
+            )
+        ):
+            ingredients.setdefault(recipe_id, []).append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    def get_subscribed_ids(self):
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return frozenset()
+        return set(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+
+    def get_author(self, row, subscribed_ids):
+        avatar = row['author__avatar']
+        return {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row['author_id'] in subscribed_ids,
+            'avatar': self.get_url(self.avatar_storage, avatar),
+            'avatar_srcset': build_srcset(
+                self.avatar_storage,
+                avatar,
+                row['author__avatar_variants'],
+                self.request,
+            ),
+        }
+
+    def get_url(self, storage, name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
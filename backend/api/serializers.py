@@ -1,17 +1,18 @@
 from django.core.validators import MinValueValidator
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerializer,
 )
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from recipes.models import (
-    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag,
-)
+from recipes import shopping_list
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 from users.models import Follow, User
 
-from .constants import MIN_AMOUNT_AND_COOKING_TIME
+from .constants import BATCH_MAX_SIZE, MIN_AMOUNT_AND_COOKING_TIME
+from .fields import Base64ImageField, SrcsetField
+from .models import ImageUpload
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -38,11 +39,29 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
+def get_recipe_prefetches():
+    """
+    Связанные объекты для RecipeSerializer.
+
+    Ингредиенты читаются одним запросом вместе со строками рецепта
+    через select_related, без отдельной выборки recipe.ingredients,
+    в порядке добавления в рецепт.
+    """
+    return (
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient'
+            ).order_by('id'),
+        ),
     )
+
+
+class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
+    # Существование ингредиентов проверяется одним запросом
+    # в RecipeCreateUpdateSerializer.validate_ingredients.
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         validators=[MinValueValidator(MIN_AMOUNT_AND_COOKING_TIME)]
     )
@@ -55,6 +74,7 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
+    avatar_srcset = SrcsetField('avatar')
 
     class Meta:
         model = User
@@ -66,20 +86,39 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_srcset',
         )
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return bool(
-            request
-            and request.user.is_authenticated
-            and obj.following.filter(user=request.user).exists()
-        )
+        if not request or not request.user.is_authenticated:
+            return False
+        return obj.id in self.get_subscribed_ids(request.user)
+
+    def get_subscribed_ids(self, user):
+        """
+        Множество id авторов, на которых подписан пользователь.
+
+        Вычисляется одним запросом и хранится в общем контексте
+        сериализаторов, поэтому вложенные и списочные сериализаторы
+        не обращаются к базе для каждого объекта.
+        """
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                Follow.objects.filter(user=user).values_list(
+                    'author_id', flat=True
+                )
+            )
+        return self.context['subscribed_ids']
 
     def get_avatar(self, obj):
-        if obj.avatar and obj.avatar.name:
-            return obj.avatar.url
-        return None
+        if not obj.avatar or not obj.avatar.name:
+            return None
+        # Абсолютный URL, как у avatar_srcset и изображений рецептов.
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(obj.avatar.url)
+        return obj.avatar.url
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -91,6 +130,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True
     )
     image = serializers.ImageField(read_only=True, use_url=True)
+    image_srcset = SrcsetField('image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -103,6 +143,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time',
             'is_favorited',
@@ -110,19 +151,27 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return bool(
-            request
-            and request.user.is_authenticated
-            and obj.favorites.filter(user=request.user).exists()
-        )
+        return self._get_user_relation_flag(obj, 'is_favorited', 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
+        return self._get_user_relation_flag(
+            obj, 'is_in_shopping_cart', 'shopping_cart'
+        )
+
+    def _get_user_relation_flag(self, obj, annotation, related_name):
+        """
+        Возвращает аннотацию из RecipeViewSet.get_queryset, если она есть.
+
+        Запрос к базе выполняется только для объектов, полученных
+        в обход вьюсета (например, после создания рецепта).
+        """
+        if hasattr(obj, annotation):
+            return bool(getattr(obj, annotation))
         request = self.context.get('request')
         return bool(
             request
             and request.user.is_authenticated
-            and obj.shopping_cart.filter(user=request.user).exists()
+            and getattr(obj, related_name).filter(user=request.user).exists()
         )
 
 
@@ -148,6 +197,20 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
+    def validate_ingredients(self, ingredients):
+        ingredient_ids = {item['id'] for item in ingredients}
+        missing = ingredient_ids - set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}.'
+            )
+        return ingredients
+
     def validate(self, data):
         request = self.context.get('request')
         is_creating = request and request.method == 'POST'
@@ -181,7 +244,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                         {'ingredients': [
                             'Количество ингредиента должно быть числом.']}
                     )
-            ingredient_ids = [ing['ingredient'].id for ing in ingredients]
+            ingredient_ids = [ing['id'] for ing in ingredients]
             if len(ingredient_ids) != len(set(ingredient_ids)):
                 raise serializers.ValidationError(
                     {'ingredients': ['Ингредиенты не должны повторяться.']}
@@ -210,6 +273,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], *get_recipe_prefetches())
         return RecipeSerializer(instance, context=self.context).data
 
     def _set_ingredients(self, recipe, ingredients):
@@ -217,12 +281,54 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             [
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient_data['ingredient'],
+                    ingredient_id=ingredient_data['id'],
                     amount=ingredient_data['amount']
                 ) for ingredient_data in ingredients
             ]
         )
 
+    def _update_ingredients(self, recipe, ingredients):
+        """
+        Приводит состав рецепта к ingredients.
+
+        Вставляются, обновляются и удаляются только отличающиеся
+        строки. Возвращает прежний и новый составы
+        в виде {ingredient_id: amount}.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in current.items()
+        }
+        new_amounts = {
+            ingredient_data['id']: ingredient_data['amount']
+            for ingredient_data in ingredients
+        }
+
+        removed = [
+            item.id for ingredient_id, item in current.items()
+            if ingredient_id not in new_amounts
+        ]
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = new_amounts.get(ingredient_id, item.amount)
+            if amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self._set_ingredients(recipe, [
+            ingredient_data for ingredient_data in ingredients
+            if ingredient_data['id'] not in current
+        ])
+        return old_amounts, new_amounts
+
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
@@ -237,25 +343,32 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     @transaction.atomic
     def update(self, instance, validated_data):
         if 'tags' in validated_data:
+            # set() сам сравнивает с текущими тегами и меняет
+            # только отличающиеся строки.
             instance.tags.set(validated_data.pop('tags'))
 
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self._set_ingredients(instance, ingredients)
+            old_amounts, new_amounts = self._update_ingredients(
+                instance, validated_data.pop('ingredients')
+            )
+            shopping_list.change_recipe_amounts(
+                instance.id,
+                shopping_list.get_deltas(old_amounts, new_amounts)
+            )
 
         return super().update(instance, validated_data)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField('image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
 
 
 class FollowSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -269,105 +382,61 @@ class FollowSerializer(UserSerializer):
             'recipes',
             'recipes_count',
             'avatar',
+            'avatar_srcset',
         )
 
+    @staticmethod
+    def get_recipes_limit(request):
+        """Значение recipes_limit из запроса или None, если не задано."""
+        try:
+            limit = int(request.query_params.get('recipes_limit'))
+        except (TypeError, ValueError):
+            return None
+        return limit if limit >= 0 else None
+
     def get_recipes(self, obj):
         request = self.context.get('request')
         if not request:
             return []
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all().order_by('id')
-        if limit:
-            try:
-                recipes = recipes[:int(limit)]
-            except ValueError:
-                pass
+        recipes = getattr(obj, 'prefetched_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.order_by('id')
+            limit = self.get_recipes_limit(request)
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = RecipeShortSerializer(
             recipes, many=True, context={'request': request}
         )
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-
-class FollowCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Follow
-        fields = ('user', 'author')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if (
-            request is None
-            or not request.user
-            or not request.user.is_authenticated
-        ):
-            raise serializers.ValidationError(
-                'Требуется аутентификация для подписки.'
-            )
-        user = request.user
-        author = data['author']
 
-        if user == author:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя.'
-            )
-        if Follow.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого пользователя.'
-            )
-        return data
-
-
-class FavoriteCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if (
-            request is None
-            or not request.user
-            or not request.user.is_authenticated
-        ):
-            raise serializers.ValidationError(
-                'Требуется аутентификация для добавления в избранное.'
-            )
-        user = request.user
-        recipe = data['recipe']
-
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в избранное.'
-            )
-        return data
-
-
-class ShoppingCartCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
+class BatchSerializer(serializers.Serializer):
+    """Списки id для пакетного добавления и удаления."""
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=BATCH_MAX_SIZE,
+        required=False,
+        default=list,
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=BATCH_MAX_SIZE,
+        required=False,
+        default=list,
+    )
 
     def validate(self, data):
-        request = self.context.get('request')
-        if (
-            request is None
-            or not request.user
-            or not request.user.is_authenticated
-        ):
+        add = list(dict.fromkeys(data['add']))
+        remove = list(dict.fromkeys(data['remove']))
+        if not add and not remove:
             raise serializers.ValidationError(
-                'Требуется аутентификация для добавления в список покупок.'
+                'Передайте хотя бы один id в add или remove.'
             )
-        user = request.user
-        recipe = data['recipe']
-
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
+        if set(add) & set(remove):
             raise serializers.ValidationError(
-                'Рецепт уже добавлен в список покупок.'
+                'Один и тот же id не может быть в add и remove.'
             )
-        return data
+        return {'add': add, 'remove': remove}
 
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
@@ -399,3 +468,9 @@ class SetAvatarSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('avatar',)
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'file')
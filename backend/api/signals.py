@@ -0,0 +1,111 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_save,
+)
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Follow, User
+
+from .cache import bump_generation_on_commit
+from .feed import invalidate_feeds, push_on_commit
+from .images import get_variants_field, schedule_thumbnails
+
+CACHED_MODELS = (Tag, Ingredient, Recipe, User)
+IMAGE_FIELDS = {Recipe: 'image', User: 'avatar'}
+
+
+def invalidate_cached_responses(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login, который
+    # в ответах API не выводится.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_generation_on_commit(sender)
+
+
+def invalidate_recipe_responses(sender, action=None, **kwargs):
+    if action is not None and not action.startswith('post_'):
+        return
+    bump_generation_on_commit(Recipe)
+
+
+def reset_image_variants(sender, instance, **kwargs):
+    # Новый файл еще не записан в хранилище (_committed=False):
+    # старые миниатюры к нему не относятся.
+    image = getattr(instance, IMAGE_FIELDS[sender])
+    instance._image_changed = bool(image) and not image._committed
+    if instance._image_changed or not image:
+        setattr(instance, get_variants_field(IMAGE_FIELDS[sender]), {})
+
+
+def process_new_image(sender, instance, **kwargs):
+    if getattr(instance, '_image_changed', False):
+        instance._image_changed = False
+        schedule_thumbnails(instance, IMAGE_FIELDS[sender])
+
+
+def push_to_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        push_on_commit(instance)
+
+
+def invalidate_follower_feed(sender, instance, created=True, **kwargs):
+    # Подписки, созданные и удаленные через api.relations, сигналов
+    # не отправляют: ленты сбрасываются в представлениях.
+    if created:
+        invalidate_feeds([instance.user_id])
+
+
+for model in CACHED_MODELS:
+    post_save.connect(
+        invalidate_cached_responses,
+        sender=model,
+        dispatch_uid=f'invalidate_{model._meta.label_lower}_on_save'
+    )
+    post_delete.connect(
+        invalidate_cached_responses,
+        sender=model,
+        dispatch_uid=f'invalidate_{model._meta.label_lower}_on_delete'
+    )
+
+post_save.connect(
+    invalidate_recipe_responses,
+    sender=RecipeIngredient,
+    dispatch_uid='invalidate_recipe_on_ingredient_save'
+)
+post_delete.connect(
+    invalidate_recipe_responses,
+    sender=RecipeIngredient,
+    dispatch_uid='invalidate_recipe_on_ingredient_delete'
+)
+m2m_changed.connect(
+    invalidate_recipe_responses,
+    sender=Recipe.tags.through,
+    dispatch_uid='invalidate_recipe_on_tags_change'
+)
+
+for model in IMAGE_FIELDS:
+    pre_save.connect(
+        reset_image_variants,
+        sender=model,
+        dispatch_uid=f'reset_{model._meta.label_lower}_image_variants'
+    )
+    post_save.connect(
+        process_new_image,
+        sender=model,
+        dispatch_uid=f'process_{model._meta.label_lower}_image'
+    )
+
+post_save.connect(
+    push_to_feeds,
+    sender=Recipe,
+    dispatch_uid='push_recipe_to_feeds'
+)
+post_save.connect(
+    invalidate_follower_feed,
+    sender=Follow,
+    dispatch_uid='invalidate_feed_on_follow_save'
+)
+post_delete.connect(
+    invalidate_follower_feed,
+    sender=Follow,
+    dispatch_uid='invalidate_feed_on_follow_delete'
+)
@@ -0,0 +1,64 @@
+"""
+Потоковая загрузка изображений в multipart-запросе.
+
+Файл пишется во временный файл частями по мере чтения запроса,
+без base64 и без загрузки целиком в память. Размер и сигнатура
+проверяются по ходу загрузки, а в конце Pillow читает только
+заголовок файла, не декодируя изображение.
+"""
+import uuid
+
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+from PIL import Image
+
+from recipes.constants import MAX_IMAGE_SIZE, MAX_IMAGE_SIZE_MB
+
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n')
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png'}
+
+INVALID_FORMAT_MESSAGE = (
+    'Поддерживаемые форматы изображений: .jpg, .jpeg, .png'
+)
+INVALID_SIZE_MESSAGE = (
+    f'Максимальный размер изображения {MAX_IMAGE_SIZE_MB}MB'
+)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик загрузки с проверкой изображения на лету.
+
+    При неверной сигнатуре или превышении размера загрузка
+    прерывается, временный файл удаляется, а причина сохраняется
+    в атрибуте error.
+    """
+    error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and not raw_data.startswith(IMAGE_SIGNATURES):
+            self.abort(INVALID_FORMAT_MESSAGE)
+        if start + len(raw_data) > MAX_IMAGE_SIZE:
+            self.abort(INVALID_SIZE_MESSAGE)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        try:
+            # open() читает только заголовок: формат и размеры.
+            with Image.open(file) as image:
+                image_format = image.format
+        except (OSError, Image.DecompressionBombError):
+            image_format = None
+        if image_format not in IMAGE_EXTENSIONS:
+            self.error = INVALID_FORMAT_MESSAGE
+            file.close()
+            return None
+        file.seek(0)
+        file.name = f'{uuid.uuid4().hex}.{IMAGE_EXTENSIONS[image_format]}'
+        return file
+
+    def abort(self, message):
+        self.error = message
+        raise StopUpload(connection_reset=False)
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from djoser import views as djoser_views
 
-from api.views import RecipeViewSet
+from api.views import ImageUploadViewSet, RecipeViewSet
 
 app_name = 'v1'
 
@@ -45,5 +45,10 @@ urlpatterns = [
         RecipeViewSet.as_view({'get': 'get_link'}),
         name='recipes-get-link'
     ),
+    path(
+        'uploads/',
+        ImageUploadViewSet.as_view({'post': 'create'}),
+        name='uploads'
+    ),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,69 +1,123 @@
+from functools import partial
+from itertools import chain
+
+from django.db import transaction
 from django.db.models import (
-    BooleanField, Count, Exists, F, OuterRef, Sum, Value,
+    BooleanField, Exists, F, OuterRef, Prefetch, Value, Window,
 )
-from django.http import HttpResponse
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from api.decorators import method_rate_limit
+from recipes import shopping_list
 from recipes.models import (
-    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag,
+    Favorite, Ingredient, Recipe, ShoppingCart, ShoppingListItem, Tag,
 )
 from users.models import Follow, User
 
+from .exporters import stream_shopping_list
+from .feed import get_cached_ids, invalidate_feeds
 from .filters import IngredientFilter, RecipeFilter
-from .mixins import CachedViewSetMixin
-from .pagination import CustomPageNumberPagination
+from .indexes import ingredient_index
+from .mixins import CachedViewSetMixin, RowListMixin
+from .pagination import CustomPageNumberPagination, FeedPagination
 from .permissions import IsAuthorOrReadOnly
+from .relations import apply_batch, delete_relations, insert_relations
+from .renderers import SHOPPING_LIST_RENDERERS
+from .rows import (
+    IngredientRowSerializer, RecipeRowSerializer, TagRowSerializer,
+)
 from .serializers import (
-    FavoriteCreateSerializer, FollowCreateSerializer, FollowSerializer,
+    BatchSerializer, FollowSerializer, ImageUploadSerializer,
     IngredientSerializer, RecipeCreateUpdateSerializer, RecipeSerializer,
-    RecipeShortSerializer, SetAvatarSerializer, ShoppingCartCreateSerializer,
-    TagSerializer, UserCreateSerializer, UserResponseOnCreateSerializer,
-    UserSerializer,
+    RecipeShortSerializer, SetAvatarSerializer, TagSerializer,
+    UserCreateSerializer, UserResponseOnCreateSerializer, UserSerializer,
+    get_recipe_prefetches,
 )
+from .uploads import ImageUploadHandler
+
+
+def get_recipes(user):
+    """Рецепты с признаками is_favorited и is_in_shopping_cart."""
+    if not user.is_authenticated:
+        return Recipe.objects.annotate(
+            is_favorited=Value(False, output_field=BooleanField()),
+            is_in_shopping_cart=Value(False, output_field=BooleanField())
+        )
+    return Recipe.objects.annotate(
+        is_favorited=Exists(
+            Favorite.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )
+        ),
+        is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )
+        )
+    )
 
 
 @method_rate_limit(requests={'GET': 200})
 class TagViewSet(CachedViewSetMixin,
+                 RowListMixin,
                  mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
                  viewsets.GenericViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    row_serializer_class = TagRowSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
 @method_rate_limit(requests={'GET': 200})
-class IngredientViewSet(CachedViewSetMixin, viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedViewSetMixin,
+                        RowListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    row_serializer_class = IngredientRowSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit')
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            limit = None
+        if limit is not None and limit < 1:
+            limit = None
+        return Response(ingredient_index.search(name, limit=limit))
+
 
 @method_rate_limit()
 class UserViewSet(mixins.ListModelMixin,
                   mixins.RetrieveModelMixin,
                   mixins.CreateModelMixin,
                   viewsets.GenericViewSet):
-    queryset = User.objects.all().prefetch_related(
-        'follower',
-        'following'
-    )
+    queryset = User.objects.all()
+    cursor_ordering = ('username', 'id')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
-        elif self.action == 'subscribe':
-            return FollowCreateSerializer
         elif self.action == 'subscriptions':
             return FollowSerializer
         return UserSerializer
@@ -112,7 +166,10 @@ class UserViewSet(mixins.ListModelMixin,
                 status=status.HTTP_400_BAD_REQUEST
             )
         serializer = SetAvatarSerializer(
-            request.user, data=request.data, partial=True
+            request.user,
+            data=request.data,
+            partial=True,
+            context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -120,8 +177,8 @@ class UserViewSet(mixins.ListModelMixin,
 
     @avatar.mapping.delete
     def delete_avatar(self, request):
-        if request.user.avatar:
-            request.user.avatar.delete(save=False)
+        # Файл может быть общим с другими записями: его удалит
+        # collect_media_garbage, когда ссылок не останется.
         request.user.avatar = None
         request.user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -134,12 +191,19 @@ class UserViewSet(mixins.ListModelMixin,
     )
     def subscribe(self, request, pk=None):
         author = get_object_or_404(User, pk=pk)
-        serializer = self.get_serializer(
-            data={'user': request.user.id, 'author': author.id},
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if author == request.user:
+            return Response(
+                {'errors': 'Нельзя подписаться на самого себя.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not insert_relations(
+            Follow, request.user.pk, 'author', [author.pk]
+        ):
+            return Response(
+                {'errors': 'Вы уже подписаны на этого пользователя.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        invalidate_feeds([request.user.pk])
         response_serializer = FollowSerializer(
             author, context={'request': request}
         )
@@ -150,18 +214,68 @@ class UserViewSet(mixins.ListModelMixin,
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, pk=None):
-        user = request.user
         author = get_object_or_404(User, pk=pk)
-
-        deleted_count, _ = Follow.objects.filter(
-            user=user, author=author).delete()
-        if deleted_count:
+        # DELETE ... RETURNING: при параллельных запросах счетчик
+        # подписчиков уменьшает только тот, что действительно удалил
+        # строку.
+        if delete_relations(Follow, request.user.pk, 'author', [author.pk]):
+            invalidate_feeds([request.user.pk])
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'detail': 'Вы не подписаны на этого пользователя'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe/batch'
+    )
+    def subscribe_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            results, added, removed = apply_batch(
+                Follow,
+                request.user,
+                'author',
+                User.objects.all(),
+                forbidden=(request.user.pk,),
+                **serializer.validated_data
+            )
+            if added or removed:
+                invalidate_feeds([request.user.pk])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def get_recipes_prefetch(self, user, limit=None):
+        """
+        Prefetch первых limit рецептов каждого автора из подписок.
+
+        Рецепты нумеруются внутри автора оконной функцией ROW_NUMBER(),
+        и в выборку попадают только первые limit из них, поэтому
+        объем данных не зависит от числа рецептов у авторов.
+        """
+        recipes = Recipe.objects.order_by('id')
+        if limit is not None:
+            ranked = Recipe.objects.filter(
+                author__following__user=user
+            ).annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('id').asc()
+                )
+            ).order_by().values('id', 'row_number')
+            sql, params = ranked.query.sql_with_params()
+            recipes = recipes.filter(id__in=RawSQL(
+                f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s',
+                (*params, limit)
+            ))
+        return Prefetch(
+            'recipes', queryset=recipes, to_attr='prefetched_recipes'
+        )
+
     @action(
         detail=False,
         methods=['get'],
@@ -172,9 +286,11 @@ class UserViewSet(mixins.ListModelMixin,
         user = request.user
         authors = User.objects.filter(
             following__user=user
-        ).annotate(
-            recipes_count=Count('recipes')
-        ).prefetch_related('recipes')
+        ).prefetch_related(
+            self.get_recipes_prefetch(
+                user, FollowSerializer.get_recipes_limit(request)
+            )
+        ).order_by(*self.cursor_ordering)
         pages = self.paginate_queryset(authors)
         serializer = FollowSerializer(
             pages,
@@ -183,56 +299,57 @@ class UserViewSet(mixins.ListModelMixin,
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+        url_path='feed'
+    )
+    def feed(self, request):
+        """Новые рецепты авторов из подписок, от новых к старым."""
+        user = request.user
+        serializer = RecipeRowSerializer({'request': request})
+        recipes = serializer.get_values(
+            get_recipes(user).filter(author_id__in=Follow.objects.filter(
+                user=user
+            ).values('author_id'))
+        )
+        page = self.paginator.paginate_feed(
+            recipes, request, partial(get_cached_ids, user)
+        )
+        return self.get_paginated_response(
+            serializer.to_representation(page)
+        )
+
 
 @method_rate_limit()
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedViewSetMixin, RowListMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthorOrReadOnly,)
+    row_serializer_class = RecipeRowSerializer
+    cache_models = (Recipe, Tag, Ingredient, User)
+    cache_anonymous_only = True
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = CustomPageNumberPagination
 
+    def should_cache(self, request):
+        # Счетчики популярности меняются через UPDATE без смены
+        # поколения Recipe: кэш отдавал бы устаревший порядок.
+        return super().should_cache(request) and (
+            request.query_params.get('ordering') != 'popular'
+        )
+
     def get_queryset(self):
-        user = self.request.user
-        queryset = Recipe.objects.select_related(
+        return get_recipes(self.request.user).select_related(
             'author'
-        ).prefetch_related(
-            'tags',
-            'ingredients',
-            'recipe_ingredients',
-            'favorites',
-            'shopping_cart'
-        )
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                )
-            )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
-            )
-        return queryset
+        ).prefetch_related(*get_recipe_prefetches())
 
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return RecipeCreateUpdateSerializer
 
-        if self.action == 'favorite':
-            return FavoriteCreateSerializer
-        if self.action == 'shopping_cart':
-            return ShoppingCartCreateSerializer
-
         return RecipeSerializer
 
     def get_serializer_context(self):
@@ -248,12 +365,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        serializer = self.get_serializer(
-            data={'user': request.user.id, 'recipe': recipe.id},
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if not insert_relations(
+            Favorite, request.user.pk, 'recipe', [recipe.pk]
+        ):
+            return Response(
+                {'errors': 'Рецепт уже добавлен в избранное.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         response_serializer = RecipeShortSerializer(recipe)
         return Response(
             response_serializer.data, status=status.HTTP_201_CREATED
@@ -261,12 +379,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
-        user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
-
-        deleted_count, _ = Favorite.objects.filter(
-            user=user, recipe=recipe).delete()
-        if deleted_count > 0:
+        if delete_relations(
+            Favorite, request.user.pk, 'recipe', [recipe.pk]
+        ):
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': 'Рецепт не найден в избранном'},
@@ -280,12 +396,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        serializer = self.get_serializer(
-            data={'user': request.user.id, 'recipe': recipe.id},
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        user = request.user
+        with transaction.atomic():
+            added = insert_relations(
+                ShoppingCart, user.pk, 'recipe', [recipe.pk]
+            )
+            shopping_list.add_recipes(user.pk, added)
+        if not added:
+            return Response(
+                {'errors': 'Рецепт уже добавлен в список покупок.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         response_serializer = RecipeShortSerializer(recipe)
         return Response(
             response_serializer.data, status=status.HTTP_201_CREATED
@@ -295,16 +416,61 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk=None):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
-
-        deleted_count, _ = ShoppingCart.objects.filter(
-            user=user, recipe=recipe).delete()
-        if deleted_count > 0:
+        with transaction.atomic():
+            # Ингредиенты вычитаются, только если строка удалена этим
+            # запросом, а не параллельным повтором.
+            removed = delete_relations(
+                ShoppingCart, user.pk, 'recipe', [recipe.pk]
+            )
+            shopping_list.remove_recipes(user.pk, removed)
+        if removed:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': 'Рецепт не найден в списке покупок'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite/batch'
+    )
+    def favorite_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            results, _, _ = apply_batch(
+                Favorite,
+                request.user,
+                'recipe',
+                Recipe.objects.all(),
+                **serializer.validated_data
+            )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart/batch'
+    )
+    def shopping_cart_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        with transaction.atomic():
+            results, added, removed = apply_batch(
+                ShoppingCart,
+                user,
+                'recipe',
+                Recipe.objects.all(),
+                **serializer.validated_data
+            )
+            shopping_list.add_recipes(user.id, added)
+            shopping_list.remove_recipes(user.id, removed)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     @action(
         detail=True,
         methods=['get'],
@@ -318,45 +484,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        if not user.shopping_cart.exists():
-            return Response(
-                {'errors': 'Список покупок пуст'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        ingredients = RecipeIngredient.objects.select_related(
-            'ingredient'
-        ).filter(
-            recipe__shopping_cart__user=user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values(
+            'amount',
             name=F('ingredient__name'),
             measurement_unit=F('ingredient__measurement_unit')
-        ).annotate(amount=Sum('amount'))
+        ).order_by('name').iterator()
 
-        if not ingredients:
+        first = next(ingredients, None)
+        if first is None:
             return Response(
-                {'errors': 'Нет ингредиентов для списка покупок'},
+                {'errors': 'Список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return stream_shopping_list(
+            chain((first,), ingredients),
+            request.accepted_renderer.format
+        )
 
-        shopping_list = []
-        for ingredient in ingredients:
-            shopping_list.append(
-                f'{ingredient["name"]} '
-                f'({ingredient["measurement_unit"]}) - '
-                f'{ingredient["amount"]}'
-            )
-        shopping_list = '\n'.join(shopping_list)
 
-        response = HttpResponse(
-            shopping_list,
-            content_type='text/plain; charset=utf-8'
-        )
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
-        )
-        return response
+@method_rate_limit(requests={'POST': 30})
+class ImageUploadViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """
+    Загрузка изображения в multipart-запросе (поле file).
+
+    Возвращает id, который можно передать в поле image рецепта
+    или avatar пользователя вместо base64.
+    """
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    def create(self, request, *args, **kwargs):
+        # Обработчик задается до первого обращения к request.data,
+        # которое и запускает разбор тела запроса.
+        handler = ImageUploadHandler(request._request)
+        request.upload_handlers = [handler]
+        serializer = self.get_serializer(data=request.data)
+        if handler.error is not None:
+            raise ValidationError({'file': [handler.error]})
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
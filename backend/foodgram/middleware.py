@@ -0,0 +1,88 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BROTLI_QUALITY = 5
+MIN_COMPRESS_LENGTH = 200
+COMPRESS_PATH_PREFIX = '/api/'
+# Ответ на вход содержит токен авторизации.
+COMPRESS_EXCLUDED_PREFIXES = ('/api/auth/',)
+COMPRESS_CONTENT_TYPES = ('application/json',)
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+def compress_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжатие ответов brotli или gzip по заголовку Accept-Encoding.
+
+    Включается настройкой API_COMPRESSION и сжимает только JSON-ответы
+    /api/, кроме выдачи токенов. HTML админки и browsable API содержит
+    CSRF-токены, и его сжатие открывает атаку BREACH.
+
+    brotli выбирается, если клиент его принимает и установлен пакет
+    brotli, иначе ответ сжимается как в GZipMiddleware. Потоковые
+    ответы сжимаются по частям, без сборки целиком в памяти.
+    """
+
+    def should_compress(self, request, response):
+        content_type = response.get('Content-Type', '')
+        return (
+            settings.API_COMPRESSION
+            and request.path.startswith(COMPRESS_PATH_PREFIX)
+            and not request.path.startswith(COMPRESS_EXCLUDED_PREFIXES)
+            and content_type.split(';')[0].strip() in COMPRESS_CONTENT_TYPES
+        )
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+        if brotli is None or not re_accepts_brotli.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        ):
+            return super().process_response(request, response)
+        if not response.streaming and (
+            len(response.content) < MIN_COMPRESS_LENGTH
+        ):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = brotli.compress(
+                response.content, quality=BROTLI_QUALITY
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(response.content))
+
+        # Как и в GZipMiddleware: сжатое тело побайтово отличается
+        # от исходного, поэтому ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,27 @@
+class CounterFieldsMixin:
+    """
+    Модель с денормализованными счетчиками (recipes.counters).
+
+    Счетчики меняются только запросом UPDATE ... SET поле = поле + n.
+    Обычный save() существующего объекта их не записывает: иначе он
+    вернул бы значения, прочитанные до параллельного изменения.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                # Как save() без update_fields, но без счетчиков
+                # и отложенных полей.
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields
+                if name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -29,7 +29,9 @@ CACHES = {  # type: ignore
     }
 }
 
-CACHE_TTL = 60 * 5
+# Ответы кэшируются с версиями по моделям и сбрасываются при изменениях
+# (см. api.cache), поэтому срок жизни может быть долгим.
+CACHE_TTL = 60 * 60 * 24
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -112,9 +116,21 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Количество прокси перед приложением (nginx): IP клиента берется
+    # из X-Forwarded-For, а не из общего для всех REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 DJOSER = {
@@ -147,6 +163,15 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.getenv('DJANGO_MEDIA_ROOT', BASE_DIR / 'media')
 
+# Число процессов для построения миниатюр (см. api.images).
+# 0 — обрабатывать изображения синхронно после коммита.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Сжатие JSON-ответов /api/ в foodgram.middleware (по умолчанию
+# выключено). HTML-страницы с CSRF-токенами не сжимаются никогда
+# из-за атаки BREACH.
+API_COMPRESSION = bool(int(os.getenv('API_COMPRESSION', 0)))
+
 AUTH_USER_MODEL = 'users.User'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище с именами файлов по хэшу содержимого.
+
+    Файл сохраняется как <каталог>/<ab>/<sha256><расширение>, поэтому
+    одинаковые загрузки делят один файл, а повторная запись
+    пропускается. Содержимое по такому имени не меняется, и его
+    можно кэшировать бессрочно. Файлы без ссылок удаляет команда
+    collect_media_garbage.
+    """
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return '/'.join(
+            part for part in (directory, digest[:2], digest + extension)
+            if part
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        hashed_name = self.get_hashed_name(name, content)
+        if self.exists(hashed_name):
+            return hashed_name
+        saved_name = self._save(hashed_name, content)
+        if saved_name != hashed_name:
+            # Тот же файл успели записать параллельно.
+            self.delete(saved_name)
+        return hashed_name
+
+
+content_storage = ContentAddressedStorage()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import shopping_list
 from .models import (
     Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag,
 )
@@ -27,14 +28,25 @@ class RecipeIngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'cooking_time', 'in_favorites')
+    list_display = (
+        'name', 'author', 'cooking_time', 'favorites_count', 'cart_count',
+    )
     search_fields = ('name', 'author__username', 'tags__name')
     list_filter = ('author', 'name', 'tags')
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description='В избранном')
-    def in_favorites(self, obj):
-        return obj.favorites.count()
+    def save_related(self, request, form, formsets, change):
+        old_amounts = (
+            shopping_list.get_amounts(form.instance) if change else {}
+        )
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.change_recipe_amounts(
+                form.instance.id,
+                shopping_list.get_deltas(
+                    old_amounts, shopping_list.get_amounts(form.instance)
+                )
+            )
 
 
 @admin.register(Favorite)
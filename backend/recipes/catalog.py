@@ -0,0 +1,227 @@
+"""
+Перенос рецептов между базами в формате NDJSON.
+
+Каждая строка файла — один рецепт:
+{"name", "text", "cooking_time", "pub_date", "author" (email),
+"image" (имя файла в хранилище), "image_variants",
+"tags" ([slug]), "ingredients" ([{"name", "measurement_unit",
+"amount"}])}.
+
+Файлы изображений не копируются: в файле хранятся только их имена,
+поэтому каталог media переносится отдельно.
+"""
+import json
+
+from django.db import DatabaseError, transaction
+from django.utils.dateparse import parse_datetime
+
+from users.models import User
+
+from . import counters
+from .constants import (
+    MAX_AMOUNT, MAX_COOKING_TIME, MAX_LENGTH_RECIPE_NAME, MIN_AMOUNT,
+    MIN_COOKING_TIME,
+)
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+
+RECIPE_FIELDS = (
+    'id', 'name', 'text', 'cooking_time', 'pub_date', 'image',
+    'image_variants', 'author__email',
+)
+
+_maps = None
+
+
+def export_lines(batch_size):
+    """Строки NDJSON со всеми рецептами в порядке id."""
+    last_id = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values(*RECIPE_FIELDS)[:batch_size]
+        )
+        if not recipes:
+            return
+        last_id = recipes[-1]['id']
+        ids = [recipe['id'] for recipe in recipes]
+
+        ingredients = {}
+        for recipe_id, name, unit, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids)
+            .order_by('id')
+            .values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount',
+            )
+        ):
+            ingredients.setdefault(recipe_id, []).append({
+                'name': name, 'measurement_unit': unit, 'amount': amount,
+            })
+        tags = {}
+        for recipe_id, slug in (
+            Recipe.tags.through.objects.filter(recipe_id__in=ids)
+            .order_by('id')
+            .values_list('recipe_id', 'tag__slug')
+        ):
+            tags.setdefault(recipe_id, []).append(slug)
+
+        for recipe in recipes:
+            recipe_id = recipe.pop('id')
+            recipe['author'] = recipe.pop('author__email')
+            recipe['pub_date'] = recipe['pub_date'].isoformat()
+            recipe['image'] = recipe['image'] or None
+            recipe['tags'] = tags.get(recipe_id, [])
+            recipe['ingredients'] = ingredients.get(recipe_id, [])
+            yield json.dumps(recipe, ensure_ascii=False)
+
+
+def load_maps():
+    """
+    Словари для поиска авторов, тегов и ингредиентов без запросов.
+
+    Строятся один раз; процессы пула импорта получают их при fork.
+    """
+    global _maps
+    _maps = (
+        dict(User.objects.values_list('email', 'id')),
+        dict(Tag.objects.values_list('slug', 'id')),
+        {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        },
+    )
+
+
+def _parse(line, authors, tags, ingredients):
+    data = json.loads(line)
+    name = data['name']
+    if not isinstance(name, str) or not name.strip() or (
+        len(name) > MAX_LENGTH_RECIPE_NAME
+    ) or '\x00' in name:
+        raise ValueError('некорректное название')
+    if not isinstance(data['text'], str) or '\x00' in data['text']:
+        raise ValueError('некорректное описание')
+    cooking_time = int(data['cooking_time'])
+    if not MIN_COOKING_TIME <= cooking_time <= MAX_COOKING_TIME:
+        raise ValueError('некорректное время приготовления')
+    pub_date = parse_datetime(data['pub_date'])
+    if pub_date is None:
+        raise ValueError('некорректная дата публикации')
+    if data['author'] not in authors:
+        raise ValueError(f'автор {data["author"]} не найден')
+    image = data.get('image') or None
+    if image is not None and (
+        not isinstance(image, str)
+        or len(image) > Recipe._meta.get_field('image').max_length
+        or '\x00' in image
+    ):
+        raise ValueError('некорректное имя изображения')
+
+    if not data['ingredients']:
+        raise ValueError('нет ингредиентов')
+    if not data['tags']:
+        raise ValueError('нет тегов')
+    if len(set(data['tags'])) != len(data['tags']):
+        raise ValueError('теги повторяются')
+
+    amounts = {}
+    for item in data['ingredients']:
+        key = (item['name'], item['measurement_unit'])
+        if key not in ingredients:
+            raise ValueError(f'ингредиент {", ".join(key)} не найден')
+        if ingredients[key] in amounts:
+            raise ValueError(f'ингредиент {", ".join(key)} повторяется')
+        amount = int(item['amount'])
+        if not MIN_AMOUNT <= amount <= MAX_AMOUNT:
+            raise ValueError('некорректное количество ингредиента')
+        amounts[ingredients[key]] = amount
+    missing_tags = set(data['tags']) - tags.keys()
+    if missing_tags:
+        raise ValueError(f'теги не найдены: {", ".join(missing_tags)}')
+
+    recipe = Recipe(
+        author_id=authors[data['author']],
+        name=name,
+        text=data['text'],
+        cooking_time=cooking_time,
+        image=image,
+        image_variants=data.get('image_variants') or {},
+    )
+    tag_ids = {tags[slug] for slug in data['tags']}
+    return recipe, pub_date, amounts, tag_ids
+
+
+def import_lines(start, lines):
+    """
+    Создает рецепты из строк NDJSON одной транзакцией.
+
+    start — номер первой строки в файле для сообщений об ошибках.
+    Возвращает (количество созданных рецептов, [ошибки]).
+    """
+    if _maps is None:
+        load_maps()
+    parsed = []
+    errors = []
+    for number, line in enumerate(lines, start):
+        if not line.strip():
+            continue
+        try:
+            parsed.append((number, _parse(line, *_maps)))
+        except KeyError as error:
+            errors.append(f'Строка {number}: нет поля {error}')
+        except (ValueError, TypeError) as error:
+            errors.append(f'Строка {number}: {error}')
+    if not parsed:
+        return 0, errors
+
+    try:
+        _save([item for _, item in parsed])
+        return len(parsed), errors
+    except (DatabaseError, ValueError):
+        # ValueError psycopg2 выбрасывает до запроса, например
+        # для строк с символом NUL.
+        pass
+    # Пачка откатилась целиком: рецепты сохраняются по одному,
+    # чтобы пропустить только строки, которые отвергла база.
+    created = 0
+    for number, item in parsed:
+        # После отката у рецепта остается id из отмененной вставки.
+        item[0].pk = None
+        try:
+            _save([item])
+            created += 1
+        except (DatabaseError, ValueError) as error:
+            errors.append(f'Строка {number}: {str(error).strip()}')
+    return created, errors
+
+
+def _save(parsed):
+    recipes = [recipe for recipe, _, _, _ in parsed]
+    through = Recipe.tags.through
+    with transaction.atomic():
+        Recipe.objects.bulk_create(recipes)
+        # auto_now_add подменяет дату публикации при создании,
+        # поэтому исходная дата из файла записывается отдельным
+        # запросом. Она берется из разобранной строки: после
+        # неудачной пачки в рецепте уже стоит время импорта.
+        for recipe, pub_date, _, _ in parsed:
+            recipe.pub_date = pub_date
+        Recipe.objects.bulk_update(recipes, ['pub_date'])
+        # bulk_create не отправляет сигналы, которые обновляют
+        # счетчики рецептов авторов.
+        counters.rows_changed(
+            Recipe, [recipe.author_id for recipe in recipes], 1
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for recipe, _, amounts, _ in parsed
+            for ingredient_id, amount in amounts.items()
+        )
+        through.objects.bulk_create(
+            through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, _, _, tag_ids in parsed
+            for tag_id in tag_ids
+        )
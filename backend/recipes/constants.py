@@ -5,5 +5,11 @@ MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT = 64
 MAX_LENGTH_RECIPE_NAME = 256
 MIN_COOKING_TIME = 1
 MIN_AMOUNT = 1
+# Предел PositiveSmallIntegerField.
+MAX_COOKING_TIME = 32767
+MAX_AMOUNT = 32767
 MESSAGE_MIN_COOKING_TIME = 'Минимальное время приготовления 1 минута'
 MESSAGE_MIN_AMOUNT = 'Минимальное количество 1'
+SEARCH_CONFIG = 'russian'
+MAX_IMAGE_SIZE_MB = 2
+MAX_IMAGE_SIZE = MAX_IMAGE_SIZE_MB * 1024 * 1024
@@ -0,0 +1,107 @@
+"""
+Денормализованные счетчики популярности.
+
+Recipe.favorites_count и cart_count, User.recipes_count и
+followers_count меняются одним UPDATE ... SET поле = поле + n,
+поэтому параллельные запросы не теряют изменения. Изменения через
+ORM учитываются сигналами (recipes.signals), а вставки и удаления
+в обход сигналов (api.relations, bulk_create) вызывают
+rows_changed явно.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+# Модель, строки которой считаются -> (поле-ссылка, модель со
+# счетчиком, счетчик).
+COUNTERS = {
+    Favorite: ('recipe', Recipe, 'favorites_count'),
+    ShoppingCart: ('recipe', Recipe, 'cart_count'),
+    Recipe: ('author', User, 'recipes_count'),
+    Follow: ('author', User, 'followers_count'),
+}
+
+
+def change(model, field, deltas):
+    """
+    Изменяет счетчик field объектов model.
+
+    deltas — {pk: изменение}; объекты с одинаковым изменением
+    обновляются одним запросом.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def rows_changed(model, target_ids, delta):
+    """
+    Учитывает добавление (delta=1) или удаление (delta=-1) строк
+    model, ссылающихся на объекты target_ids.
+
+    target_ids может повторяться: каждое вхождение — одна строка.
+    """
+    if model not in COUNTERS or not target_ids:
+        return
+    _, counter_model, field = COUNTERS[model]
+    change(counter_model, field, {
+        pk: count * delta for pk, count in Counter(target_ids).items()
+    })
+
+
+def _get_counters():
+    """{модель со счетчиком: {счетчик: выражение для пересчета}}."""
+    counters = defaultdict(dict)
+    for model, (field, counter_model, counter) in COUNTERS.items():
+        counters[counter_model][counter] = Coalesce(
+            Subquery(
+                model.objects.filter(**{field: OuterRef('pk')})
+                .order_by()
+                .values(field)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            Value(0),
+        )
+    return counters
+
+
+def rebuild():
+    """Пересчитывает все счетчики по текущим строкам."""
+    for model, counters in _get_counters().items():
+        model.objects.update(**counters)
+
+
+def find_mismatches():
+    """
+    Сравнивает счетчики с живой агрегацией.
+
+    Возвращает список кортежей
+    (модель, pk, счетчик, сохранено, ожидается).
+    """
+    mismatches = []
+    for model, counters in _get_counters().items():
+        queryset = model.objects.annotate(**{
+            f'expected_{field}': expression
+            for field, expression in counters.items()
+        }).order_by('pk')
+        for row in queryset.values('pk', *counters, *(
+            f'expected_{field}' for field in counters
+        )).iterator():
+            for field in counters:
+                if row[field] != row[f'expected_{field}']:
+                    mismatches.append((
+                        model, row['pk'], field,
+                        row[field], row[f'expected_{field}'],
+                    ))
+    return mismatches
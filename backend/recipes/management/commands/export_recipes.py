@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import export_lines
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов с ингредиентами и тегами в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Файл для выгрузки (по умолчанию stdout)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов, читаемых из базы за один раз',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = max(1, options['batch_size'])
+        if path == '-':
+            count = self.write(sys.stdout, batch_size)
+            self.stderr.write(f'Выгружено рецептов: {count}')
+            return
+        with open(path, 'w', encoding='utf-8') as file:
+            count = self.write(file, batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f'Выгружено рецептов: {count}')
+        )
+
+    def write(self, file, batch_size):
+        count = 0
+        for line in export_lines(batch_size):
+            file.write(line)
+            file.write('\n')
+            count += 1
+        return count
@@ -1,65 +1,182 @@
+import csv
+import io
+import json
 import os
+import re
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import bump_generation
+from recipes.constants import (
+    MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT, MAX_LENGTH_INGREDIENT_NAME,
+)
 from recipes.models import Ingredient
 
+STAGING_TABLE = 'ingredient_import'
+JSON_SEPARATORS = re.compile(r'[\s\[\],]*')
+JSON_CHUNK_SIZE = 64 * 1024
 
-class Command(BaseCommand):
-    help = 'Импорт ингредиентов из CSV файла'
 
-    def handle(self, *args, **options):
-        csv_file = os.path.join(os.getcwd(), 'data', 'ingredients.csv')
+def iter_json(file):
+    """
+    Объекты из JSON-массива или JSON Lines без чтения файла целиком.
 
+    Объекты разбираются по одному через raw_decode по мере
+    чтения файла блоками.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                ingredients_to_create = []
-
-                for line in file:
-                    line = line.strip()
-                    self.stdout.write(f'Обработка строки: {line}')
-
-                    try:
-                        name, measurement_unit = line.split(',')
-                        ingredients_to_create.append(
-                            Ingredient(
-                                name=name.strip(),
-                                measurement_unit=measurement_unit.strip()
-                            )
-                        )
-                    except ValueError as e:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Пропуск строки "{line}": {str(e)}'
-                            )
-                        )
-                        continue
-
-                if ingredients_to_create:
-                    Ingredient.objects.bulk_create(
-                        ingredients_to_create,
-                        ignore_conflicts=True
-                    )
-                    count = len(ingredients_to_create)
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Импортировано {count} ингредиентов'
-                        )
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING('Нет ингредиентов для импорта')
+            if position == len(buffer):
+                raise ValueError
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                if position < len(buffer):
+                    raise CommandError(
+                        f'Некорректный JSON: {buffer[position:][:100]}'
                     )
+                return
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if isinstance(item, dict):
+            yield [item.get('name'), item.get('measurement_unit')]
+        else:
+            yield [item]
+
+
+READERS = {'csv': csv.reader, 'json': iter_json}
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт ингредиентов из CSV или JSON. '
+        'Повторный импорт того же файла ничего не меняет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(os.getcwd(), 'data', 'ingredients.csv'),
+            help='Путь к файлу (по умолчанию data/ingredients.csv)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Количество строк в одной загрузке через COPY',
+        )
+        parser.add_argument(
+            '--progress',
+            type=int,
+            default=100000,
+            help='Выводить прогресс каждые N строк',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла {path}: укажите --format'
+            )
+        self.batch_size = max(1, options['batch_size'])
+        self.progress = max(1, options['progress'])
+        self.processed = self.inserted = self.existing = self.invalid = 0
 
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                self.create_staging_table()
+                self.load(self.clean(READERS[file_format](file)))
         except FileNotFoundError:
-            self.stdout.write(
-                self.style.ERROR(
-                    f'Файл {csv_file} не найден'
-                )
+            raise CommandError(f'Файл {path} не найден')
+        except UnicodeDecodeError as error:
+            raise CommandError(f'Файл {path} не в UTF-8: {error}')
+
+        if self.inserted:
+            bump_generation(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {self.processed}. '
+            f'Добавлено: {self.inserted}, '
+            f'уже были в базе или повторялись в файле: {self.existing}, '
+            f'пропущено из-за ошибок: {self.invalid}'
+        ))
+
+    def clean(self, rows):
+        """Проверенные пары (название, единица) из строк файла."""
+        for row in rows:
+            self.processed += 1
+            if self.processed % self.progress == 0:
+                self.stdout.write(f'Обработано строк: {self.processed}')
+            if len(row) != 2 or not all(
+                isinstance(value, str) for value in row
+            ):
+                self.skip(row)
+                continue
+            name, measurement_unit = (value.strip() for value in row)
+            if (
+                not name
+                or not measurement_unit
+                or len(name) > MAX_LENGTH_INGREDIENT_NAME
+                or len(measurement_unit)
+                > MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT
+            ):
+                self.skip(row)
+                continue
+            yield name, measurement_unit
+
+    def skip(self, row):
+        self.invalid += 1
+        self.stdout.write(self.style.WARNING(f'Пропуск строки: {row}'))
+
+    def create_staging_table(self):
+        # Временная таблица живет до конца сессии, а ее строки
+        # очищаются при коммите каждой пачки.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} '
+                f'(name text, measurement_unit text) '
+                f'ON COMMIT DELETE ROWS'
             )
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(
-                    f'Ошибка при импорте ингредиентов: {e}'
+
+    def load(self, ingredients):
+        while True:
+            batch = list(islice(ingredients, self.batch_size))
+            if not batch:
+                return
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            table = connection.ops.quote_name(Ingredient._meta.db_table)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer
                 )
-            )
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    f'SELECT DISTINCT name, measurement_unit '
+                    f'FROM {STAGING_TABLE} '
+                    f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+                )
+                inserted = cursor.rowcount
+            self.inserted += inserted
+            self.existing += len(batch) - inserted
@@ -0,0 +1,100 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.cache import bump_generation
+from recipes.catalog import import_lines, load_maps
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка рецептов из NDJSON, выгруженного export_recipes. '
+        'Авторы, теги и ингредиенты должны уже быть в базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одной транзакции',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество процессов; 1 — загрузка без пула',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        self.created = self.failed = 0
+        load_maps()
+        try:
+            with open(path, encoding='utf-8') as file:
+                batches = self.iter_batches(file, batch_size)
+                if workers == 1:
+                    for start, lines in batches:
+                        self.report(import_lines(start, lines))
+                else:
+                    self.run_pool(batches, workers)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден')
+        except UnicodeDecodeError as error:
+            raise CommandError(f'Файл {path} не в UTF-8: {error}')
+
+        if self.created:
+            bump_generation(Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {self.created}, '
+            f'пропущено из-за ошибок: {self.failed}'
+        ))
+        if self.created:
+            self.stdout.write(
+                'Для рецептов без миниатюр запустите build_thumbnails'
+            )
+
+    def iter_batches(self, file, batch_size):
+        start = 1
+        while True:
+            lines = list(islice(file, batch_size))
+            if not lines:
+                return
+            yield start, lines
+            start += len(lines)
+
+    def run_pool(self, batches, workers):
+        # Процессы создаются через fork и наследуют загруженный Django
+        # и словари load_maps. Открытые соединения закрываются, чтобы
+        # не делить их с дочерними процессами: каждый откроет свое.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+        ) as executor:
+            pending = set()
+            for start, lines in batches:
+                # Ограничиваем число прочитанных, но не обработанных
+                # пачек, чтобы не держать в памяти весь файл.
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.report(future.result())
+                pending.add(executor.submit(import_lines, start, lines))
+            for future in wait(pending).done:
+                self.report(future.result())
+
+    def report(self, result):
+        created, errors = result
+        self.created += created
+        self.failed += len(errors)
+        for error in errors:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(f'Создано рецептов: {self.created}')
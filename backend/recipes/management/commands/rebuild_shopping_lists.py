@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет сохраненных сумм ингредиентов в списках покупок '
+        'или их проверка по живой агрегации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только проверить суммы, не изменяя данные',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                shopping_list.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересчитаны')
+            )
+            return
+
+        mismatches = shopping_list.find_mismatches()
+        for user_id, ingredient_id, stored, expected in mismatches:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'сохранено {stored}, ожидается {expected}'
+                )
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify для пересчета.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import bump_generation
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет счетчиков избранного, списков покупок, рецептов '
+        'и подписчиков или их проверка по живой агрегации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только проверить счетчики, не изменяя данные',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                counters.rebuild()
+            for _, counter_model, _ in counters.COUNTERS.values():
+                bump_generation(counter_model)
+            self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
+            return
+
+        mismatches = counters.find_mismatches()
+        for model, pk, field, stored, expected in mismatches:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{model._meta.verbose_name} {pk}, {field}: '
+                    f'сохранено {stored}, ожидается {expected}'
+                )
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify для пересчета.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
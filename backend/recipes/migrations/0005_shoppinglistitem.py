@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_user_recipe_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Позиции списков покупок',
+                'default_related_name': 'shopping_list',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO recipes_shoppinglistitem '
+                '(user_id, ingredient_id, amount) '
+                'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) '
+                'FROM recipes_shoppingcart AS cart '
+                'JOIN recipes_recipeingredient AS item '
+                'ON item.recipe_id = cart.recipe_id '
+                'GROUP BY cart.user_id, item.ingredient_id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:17
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipe_search_vector_trigger
+BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update();
+
+UPDATE recipes_recipe SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER recipes_recipe_search_vector_trigger ON recipes_recipe;
+DROP FUNCTION recipes_recipe_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppinglistitem'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Заполняется триггером базы данных по названию и описанию.', null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunSQL(
+            sql=SEARCH_VECTOR_TRIGGER,
+            reverse_sql=DROP_SEARCH_VECTOR_TRIGGER,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='recipe_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'default_related_name': 'recipes', 'ordering': ['-pub_date', '-id'], 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
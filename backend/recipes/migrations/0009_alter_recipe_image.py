@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+import foodgram.storage
+import recipes.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=foodgram.storage.ContentAddressedStorage(), upload_to='recipes/', validators=[recipes.validators.validate_image_size, recipes.validators.validate_image_extension], verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+FILL_COUNTERS = """
+UPDATE recipes_recipe AS recipe SET
+    favorites_count = (
+        SELECT COUNT(*) FROM recipes_favorite
+        WHERE recipe_id = recipe.id
+    ),
+    cart_count = (
+        SELECT COUNT(*) FROM recipes_shoppingcart
+        WHERE recipe_id = recipe.id
+    );
+
+UPDATE users_user AS author SET
+    recipes_count = (
+        SELECT COUNT(*) FROM recipes_recipe
+        WHERE author_id = author.id
+    ),
+    followers_count = (
+        SELECT COUNT(*) FROM users_follow
+        WHERE author_id = author.id
+    );
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_alter_recipe_image'),
+        ('users', '0006_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при изменении списков покупок (см. recipes.counters).', verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при изменении избранного (см. recipes.counters).', verbose_name='В избранном'),
+        ),
+        migrations.RunSQL(
+            sql=FILL_COUNTERS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popular_idx'),
+        ),
+    ]
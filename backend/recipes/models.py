@@ -1,6 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from foodgram.mixins import CounterFieldsMixin
+from foodgram.storage import content_storage
 from users.models import User
 
 from .constants import (
@@ -59,7 +63,7 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель рецептов."""
     author = models.ForeignKey(
         User,
@@ -73,10 +77,18 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='recipes/',
+        storage=content_storage,
         validators=[validate_image_size, validate_image_extension],
         blank=True,
         null=True,
     )
+    image_variants = models.JSONField(
+        'Миниатюры картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Построенные миниатюры: {формат: [ширины]}.',
+    )
     text = models.TextField(
         'Описание',
     )
@@ -101,14 +113,54 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
-        db_index=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+        help_text='Обновляется при изменении избранного '
+                  '(см. recipes.counters).',
+    )
+    cart_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+        help_text='Обновляется при изменении списков покупок '
+                  '(см. recipes.counters).',
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+        help_text='Заполняется триггером базы данных по названию и описанию.',
     )
 
+    counter_fields = ('favorites_count', 'cart_count')
+
     class Meta:
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -153,11 +205,18 @@ class RecipeIngredient(models.Model):
 
 
 class BaseUserRecipeRelation(models.Model):
-    """Абстрактная модель для связи пользователя и рецепта."""
+    """
+    Абстрактная модель для связи пользователя и рецепта.
+
+    Отдельный индекс по user_id не создается: его покрывает составной
+    уникальный индекс (user_id, recipe_id), по которому выполняются
+    фильтры избранного и списка покупок.
+    """
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -194,3 +253,39 @@ class ShoppingCart(BaseUserRecipeRelation):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
         default_related_name = 'shopping_cart'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+
+    Денормализованная таблица, которая поддерживается инкрементально
+    при изменении списка покупок и состава рецептов
+    (см. recipes.shopping_list).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        db_index=False,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        default_related_name = 'shopping_list'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} -> {self.ingredient.name}'
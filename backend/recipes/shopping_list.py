@@ -0,0 +1,152 @@
+"""
+Инкрементальное обновление сумм ингредиентов в списках покупок.
+
+Все изменения выполняются одним INSERT ... ON CONFLICT DO UPDATE,
+поэтому параллельные запросы не теряют обновления. Строки
+с неположительным количеством удаляются следующим запросом.
+"""
+from django.db import connection
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _upsert(select_sql, params):
+    items = _table(ShoppingListItem)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {items} (user_id, ingredient_id, amount) '
+            f'{select_sql} '
+            f'ON CONFLICT (user_id, ingredient_id) '
+            f'DO UPDATE SET amount = {items}.amount + EXCLUDED.amount',
+            params
+        )
+
+
+def _apply_recipes(user_id, recipe_ids, sign):
+    _upsert(
+        f'SELECT %s, ingredient_id, {sign}SUM(amount) '
+        f'FROM {_table(RecipeIngredient)} WHERE recipe_id = ANY(%s) '
+        f'GROUP BY ingredient_id',
+        [user_id, list(recipe_ids)]
+    )
+
+
+def add_recipes(user_id, recipe_ids):
+    """Добавляет ингредиенты рецептов в список покупок пользователя."""
+    if recipe_ids:
+        _apply_recipes(user_id, recipe_ids, '')
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Вычитает ингредиенты рецептов из списка покупок пользователя."""
+    if recipe_ids:
+        _apply_recipes(user_id, recipe_ids, '-')
+        ShoppingListItem.objects.filter(
+            user_id=user_id, amount__lte=0
+        ).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    add_recipes(user_id, [recipe_id])
+
+
+def remove_recipe(user_id, recipe_id):
+    """Вычитает ингредиенты рецепта из списка покупок пользователя."""
+    remove_recipes(user_id, [recipe_id])
+
+
+def change_recipe_amounts(recipe_id, deltas):
+    """
+    Применяет изменение состава рецепта ко всем спискам покупок с ним.
+
+    deltas — словарь {ingredient_id: изменение количества}.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    values = ', '.join(['(%s, %s)'] * len(deltas))
+    params = [value for item in deltas.items() for value in item]
+    _upsert(
+        f'SELECT cart.user_id, delta.column1, delta.column2 '
+        f'FROM {_table(ShoppingCart)} AS cart, (VALUES {values}) AS delta '
+        f'WHERE cart.recipe_id = %s',
+        params + [recipe_id]
+    )
+    ShoppingListItem.objects.filter(
+        user__shopping_cart__recipe_id=recipe_id,
+        ingredient_id__in=deltas,
+        amount__lte=0,
+    ).delete()
+
+
+def get_amounts(recipe):
+    """Текущий состав рецепта: {ingredient_id: amount}."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def get_deltas(old_amounts, new_amounts):
+    """Разница между двумя составами рецепта."""
+    return {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+
+
+def rebuild():
+    """Полностью пересчитывает таблицу по текущим спискам покупок."""
+    ShoppingListItem.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {_table(ShoppingListItem)} '
+            f'(user_id, ingredient_id, amount) '
+            f'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) '
+            f'FROM {_table(ShoppingCart)} AS cart '
+            f'JOIN {_table(RecipeIngredient)} AS item '
+            f'ON item.recipe_id = cart.recipe_id '
+            f'GROUP BY cart.user_id, item.ingredient_id'
+        )
+
+
+def find_mismatches():
+    """
+    Сравнивает сохраненные суммы с живой агрегацией.
+
+    Возвращает список кортежей
+    (user_id, ingredient_id, сохранено, ожидается).
+    """
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ).iterator()
+    }
+    expected = {
+        (row['recipe__shopping_cart__user'], row['ingredient']): row['total']
+        for row in RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by().iterator()
+    }
+    return [
+        (*key, stored.get(key), expected.get(key))
+        for key in sorted(stored.keys() | expected.keys())
+        if stored.get(key) != expected.get(key)
+    ]
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, shopping_list
+from .models import ShoppingCart
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # еще не удалены, и их количество можно вычесть.
+    shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+def _get_target_id(sender, instance):
+    field, _, _ = counters.COUNTERS[sender]
+    return getattr(instance, sender._meta.get_field(field).attname)
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.rows_changed(
+            sender, [_get_target_id(sender, instance)], 1
+        )
+
+
+def count_deleted(sender, instance, **kwargs):
+    counters.rows_changed(sender, [_get_target_id(sender, instance)], -1)
+
+
+for model in counters.COUNTERS:
+    post_save.connect(
+        count_created,
+        sender=model,
+        dispatch_uid=f'count_{model._meta.label_lower}_on_save'
+    )
+    post_delete.connect(
+        count_deleted,
+        sender=model,
+        dispatch_uid=f'count_{model._meta.label_lower}_on_delete'
+    )
@@ -1,17 +1,15 @@
 from django.core.exceptions import ValidationError
 
+from .constants import MAX_IMAGE_SIZE, MAX_IMAGE_SIZE_MB
+
 
 def validate_image_size(image):
     """Валидатор для проверки размера изображения."""
-    limit_mb = 2
-    if hasattr(image.file, 'size'):
-        file_size = image.file.size
-    else:
-        file_size = len(image.file.getvalue())
-
-    if file_size > limit_mb * 1024 * 1024:
+    # size берется из метаданных файла или хранилища,
+    # содержимое в память не читается.
+    if image.size > MAX_IMAGE_SIZE:
         raise ValidationError(
-            f'Максимальный размер изображения {limit_mb}MB'
+            f'Максимальный размер изображения {MAX_IMAGE_SIZE_MB}MB'
         )
 
 
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Построенные миниатюры: {формат: [ширины]}.', verbose_name='Миниатюры аватара'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+import foodgram.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default='', null=True, storage=foodgram.storage.ContentAddressedStorage(), upload_to='users/', verbose_name='Аватар'),
+        ),
+    ]
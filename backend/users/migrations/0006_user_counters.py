@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при изменении подписок (см. recipes.counters).', verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при создании и удалении рецептов (см. recipes.counters).', verbose_name='Количество рецептов'),
+        ),
+    ]
@@ -1,13 +1,15 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.mixins import CounterFieldsMixin
+from foodgram.storage import content_storage
 from users.constants import (
     MAX_LENGTH_EMAIL, MAX_LENGTH_FIRST_NAME, MAX_LENGTH_LAST_NAME,
 )
 from users.validators import CustomEmailValidator
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """
     Модель пользователя с дополнительными полями.
     """
@@ -28,10 +30,34 @@ class User(AbstractUser):
     avatar = models.ImageField(
         'Аватар',
         upload_to='users/',
+        storage=content_storage,
         blank=True,
         null=True,
         default=''
     )
+    avatar_variants = models.JSONField(
+        'Миниатюры аватара',
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Построенные миниатюры: {формат: [ширины]}.',
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+        help_text='Обновляется при создании и удалении рецептов '
+                  '(см. recipes.counters).',
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+        help_text='Обновляется при изменении подписок '
+                  '(см. recipes.counters).',
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
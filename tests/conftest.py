@@ -0,0 +1,118 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag,
+)
+from users.models import Follow, User
+
+RECIPES_COUNT = 25
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш ответов, счетчики пагинации и лимиты запросов хранятся
+    # в Redis и не должны переходить из теста в тест.
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='reader',
+        email='reader@example.org',
+        first_name='Читатель',
+        last_name='Тестовый',
+        password='password',
+    )
+
+
+@pytest.fixture
+def authors():
+    return [
+        User.objects.create(
+            username='author',
+            email='author@example.org',
+            first_name='Автор',
+            last_name='Первый',
+            avatar='users/author.png',
+            avatar_variants={'webp': [320, 640], 'jpeg': [320, 640]},
+        ),
+        User.objects.create(
+            username='cook',
+            email='cook@example.org',
+            first_name='Повар',
+            last_name='Второй',
+        ),
+    ]
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=name, slug=slug)
+        for name, slug in (
+            ('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner')
+        )
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (
+            ('Яблоко', 'шт.'), ('ёжевика', 'г'), ('Абрикос', 'шт.'),
+            ('Мука пшеничная', 'г'), ('Соль', 'по вкусу'),
+        )
+    ]
+
+
+@pytest.fixture
+def recipes(authors, tags, ingredients):
+    recipes = []
+    for number in range(RECIPES_COUNT):
+        recipe = Recipe.objects.create(
+            author=authors[number % len(authors)],
+            name=f'Рецепт {number}',
+            text=f'Описание рецепта {number}',
+            cooking_time=number + 1,
+            image=f'recipes/recipe{number}.png',
+            image_variants=(
+                {'webp': [320, 640, 1280]} if number % 2 else {}
+            ),
+        )
+        recipe.tags.set(tags[:1 + number % len(tags)])
+        for position, ingredient in enumerate(
+            ingredients[:1 + number % len(ingredients)]
+        ):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=position + 1
+            )
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def user_relations(user, authors, recipes):
+    """Подписка, избранное и список покупок пользователя user."""
+    Follow.objects.create(user=user, author=authors[0])
+    for recipe in recipes[::3]:
+        Favorite.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[::4]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user, user_relations):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
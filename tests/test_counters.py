@@ -0,0 +1,59 @@
+import pytest
+
+from recipes.models import Favorite, Recipe
+from users.models import Follow, User
+
+
+@pytest.mark.django_db
+def test_save_keeps_counters_changed_concurrently(user, recipes, authors):
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    author = User.objects.get(pk=authors[0].pk)
+    # Счетчики меняются после того, как объекты прочитаны.
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    Follow.objects.create(user=user, author=authors[0])
+
+    recipe.name = 'Новое название'
+    recipe.save()
+    author.first_name = 'Новое имя'
+    author.save()
+
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == 1
+    assert author.first_name == 'Новое имя'
+    assert author.followers_count == 1
+    assert author.recipes_count == Recipe.objects.filter(
+        author=author
+    ).count()
+
+
+@pytest.mark.django_db
+def test_recipe_update_keeps_counters(user, user_client, recipes):
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    Recipe.objects.filter(pk=recipe.pk).update(author=user)
+    # user_relations добавил рецепт в избранное и список покупок.
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1 and recipe.cart_count == 1
+
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {'name': 'Новое название', 'cooking_time': 10},
+        format='json',
+    )
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1 and recipe.cart_count == 1
+
+
+@pytest.mark.django_db
+def test_popular_ordering_is_not_cached(client, user, recipes):
+    params = {'ordering': 'popular', 'limit': 3}
+    assert client.get('/api/recipes/', params).json()[
+        'results'
+    ][0]['id'] != recipes[5].pk
+    Favorite.objects.create(user=user, recipe=recipes[5])
+
+    response = client.get('/api/recipes/', params)
+    assert response.json()['results'][0]['id'] == recipes[5].pk
+    assert not response.has_header('ETag')
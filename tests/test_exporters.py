@@ -0,0 +1,51 @@
+import zlib
+
+import pytest
+
+from api import pdf
+
+pytestmark = pytest.mark.skipif(
+    not pdf.pdf_available(), reason='reportlab не установлен'
+)
+
+
+@pytest.mark.django_db
+def test_shopping_list_pdf(user_client):
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/', HTTP_ACCEPT='application/pdf'
+    )
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/pdf'
+    assert 'shopping_list.pdf' in response['Content-Disposition']
+    content = b''.join(response.streaming_content)
+    assert content.startswith(b'%PDF-1.4')
+    assert content.endswith(b'%%EOF\n')
+    assert b'/FontFile2' in content
+
+
+def test_pdf_pages_are_streamed():
+    lines = [f'Ингредиент {number} (г) - {number}' for number in range(200)]
+    chunks = list(pdf.iter_pdf('Список покупок', iter(lines)))
+    # Заголовок, страницы по одной и хвост со шрифтами и xref.
+    assert len(chunks) > 4
+    content = b''.join(chunks)
+    assert content.count(b'/Type /Page ') == len(chunks) - 2
+
+    # Смещения в таблице xref указывают на начала объектов.
+    xref = int(content.rsplit(b'startxref\n', 1)[1].split()[0])
+    table = content[xref:].split(b'trailer')[0].splitlines()[3:]
+    for number, entry in enumerate(table, start=1):
+        offset = int(entry.split()[0])
+        assert content[offset:].startswith(b'%d 0 obj' % number)
+
+
+def test_pdf_keeps_cyrillic_text():
+    content = b''.join(pdf.iter_pdf('Список', ['Мука (г) - 500']))
+    # ToUnicode первого подмножества отображает коды в исходные символы.
+    streams = [
+        zlib.decompress(part.split(b'stream\n', 1)[1])
+        for part in content.split(b'endstream')[:-1]
+    ]
+    cmap = next(stream for stream in streams if b'beginbfchar' in stream
+                or b'beginbfrange' in stream)
+    assert b'<041c>' in cmap.lower()
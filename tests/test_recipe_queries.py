@@ -0,0 +1,72 @@
+import pytest
+from django.core.cache import cache
+from rest_framework import mixins
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+
+LIMITS = (1, 5, 10, 20)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('client_name, queries', (
+    # COUNT, рецепты с автором, теги, ингредиенты.
+    ('client', 4),
+    # То же и подписки пользователя для is_subscribed.
+    ('user_client', 5),
+))
+def test_recipe_list_queries_do_not_grow_with_page_size(
+    request, recipes, django_assert_num_queries, client_name, queries
+):
+    client = request.getfixturevalue(client_name)
+    for limit in LIMITS:
+        # Кэш ответов и COUNT пагинации не должен скрывать запросы.
+        cache.clear()
+        with django_assert_num_queries(queries):
+            response = client.get('/api/recipes/', {'limit': limit})
+        assert response.status_code == 200
+        assert len(response.json()['results']) == limit
+
+
+@pytest.mark.django_db
+def test_recipe_cursor_page_queries_do_not_grow_with_page_size(
+    user_client, django_assert_num_queries
+):
+    for limit in LIMITS:
+        # Без COUNT: рецепты с автором, теги, ингредиенты, подписки.
+        with django_assert_num_queries(4):
+            response = user_client.get(
+                '/api/recipes/', {'limit': limit, 'cursor': ''}
+            )
+        assert response.status_code == 200
+        assert len(response.json()['results']) == limit
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated, queries', (
+    # COUNT, рецепты с автором, prefetch тегов и ингредиентов.
+    (False, 4),
+    # То же и подписки пользователя для is_subscribed.
+    (True, 5),
+))
+def test_recipe_serializer_queries_do_not_grow_with_page_size(
+    user, user_relations, django_assert_num_queries, authenticated, queries
+):
+    # Список через RecipeSerializer и prefetch из get_queryset,
+    # без сериализатора строк.
+    view = type(
+        'RecipeSerializerViewSet',
+        (RecipeViewSet,),
+        {'list': mixins.ListModelMixin.list},
+    ).as_view({'get': 'list'})
+    factory = APIRequestFactory()
+    for limit in LIMITS:
+        cache.clear()
+        request = factory.get('/api/recipes/', {'limit': limit})
+        if authenticated:
+            force_authenticate(request, user)
+        with django_assert_num_queries(queries):
+            response = view(request)
+            response.render()
+        assert response.status_code == 200
+        assert len(response.data['results']) == limit
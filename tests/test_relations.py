@@ -0,0 +1,42 @@
+import pytest
+
+from recipes import counters, shopping_list
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+
+def assert_consistent():
+    assert counters.find_mismatches() == []
+    assert shopping_list.find_mismatches() == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model, url', (
+    (ShoppingCart, '/api/recipes/{recipe}/shopping_cart/'),
+    (Favorite, '/api/recipes/{recipe}/favorite/'),
+))
+def test_repeated_recipe_relation_delete(
+    user, user_client, recipes, model, url
+):
+    recipe = recipes[0]
+    assert model.objects.filter(user=user, recipe=recipe).exists()
+    url = url.format(recipe=recipe.pk)
+
+    assert user_client.delete(url).status_code == 204
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+    assert_consistent()
+
+    # Повтор не меняет ни суммы списка покупок, ни счетчики.
+    assert user_client.delete(url).status_code == 400
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_repeated_unsubscribe(user, user_client, authors):
+    url = f'/api/users/{authors[0].pk}/subscribe/'
+    assert user_client.delete(url).status_code == 204
+    assert not Follow.objects.filter(user=user, author=authors[0]).exists()
+    assert_consistent()
+
+    assert user_client.delete(url).status_code == 400
+    assert_consistent()
@@ -0,0 +1,110 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rest_framework import mixins
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.mixins import RowListMixin
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+def get_views(viewset):
+    """
+    Список viewset через сериализатор строк и через ModelSerializer.
+
+    Кэш ответов в обоих вариантах не используется.
+    """
+    return [
+        type(
+            f'{viewset.__name__}{name}',
+            (viewset,),
+            {'list': method},
+        ).as_view({'get': 'list'})
+        for name, method in (
+            ('Rows', RowListMixin.list),
+            ('Serializer', mixins.ListModelMixin.list),
+        )
+    ]
+
+
+def get_data(view, path, params, user=None):
+    request = APIRequestFactory().get(path, params)
+    if user is not None:
+        force_authenticate(request, user)
+    response = view(request)
+    response.render()
+    assert response.status_code == 200, response.content
+    return json.loads(response.content)
+
+
+def assert_same_output(viewset, path, params, user=None):
+    rows_view, serializer_view = get_views(viewset)
+    rows_data = get_data(rows_view, path, params, user)
+    assert rows_data == get_data(serializer_view, path, params, user)
+    return rows_data
+
+
+@pytest.mark.django_db
+def test_tag_rows_match_serializer(tags):
+    data = assert_same_output(TagViewSet, '/api/tags/', {})
+    assert len(data) == len(tags)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', ({}, {'name': 'а'}, {'name': 'Ё'}))
+def test_ingredient_rows_match_serializer(ingredients, params):
+    assert_same_output(IngredientViewSet, '/api/ingredients/', params)
+
+
+RECIPE_PARAMS = (
+    {},
+    {'limit': 7},
+    {'limit': 7, 'page': 2},
+    {'tags': 'lunch'},
+    {'tags': ['lunch', 'dinner'], 'limit': 4},
+    {'is_favorited': 1},
+    {'is_in_shopping_cart': 1},
+    {'is_favorited': 1, 'is_in_shopping_cart': 1, 'tags': 'dinner'},
+    {'ordering': 'popular', 'limit': 5},
+    {'cursor': '', 'limit': 6},
+    {'cursor': '', 'limit': 6, 'tags': 'breakfast'},
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('params', RECIPE_PARAMS)
+def test_recipe_rows_match_serializer(
+    user, authors, user_relations, authenticated, params
+):
+    user = user if authenticated else None
+    assert_same_output(RecipeViewSet, '/api/recipes/', params, user)
+    assert_same_output(
+        RecipeViewSet,
+        '/api/recipes/',
+        {**params, 'author': authors[0].pk},
+        user,
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_recipe_rows_match_serializer_on_cursor_pages(
+    user, recipes, user_relations, authenticated
+):
+    user = user if authenticated else None
+    params = {'cursor': '', 'limit': 4}
+    pages = 0
+    while True:
+        data = assert_same_output(
+            RecipeViewSet, '/api/recipes/', params, user
+        )
+        pages += 1
+        if data['next'] is None:
+            break
+        params = {
+            name: values[0]
+            for name, values in parse_qs(urlparse(data['next']).query).items()
+        }
+    assert pages == -(-len(recipes) // 4)